@@ -1,126 +1,155 @@
+import atexit
+import logging
+import time
+
+import flask
 import pandas as pd
 import dash
 from dash import dcc, html, Input, Output
 import dash_bootstrap_components as dbc
 import plotly.express as px
 import ModelDash as Model # Importar las funciones del archivo Model.py
+import reloading
+
+logger = logging.getLogger(__name__)
 
-# Cargar el DataFrame desde el archivo
-df = pd.read_csv('data/pumps_cleaned.csv')
+# Caché de consultas compartido por todas las versiones de los datos
+query_cache = Model.QueryCache()
+atexit.register(query_cache.save)
+
+# Pozos con sus índices (archivo columnar mapeado en memoria si existe; si no,
+# el CSV). Se recargan en caliente cuando cambian los archivos de datos.
+data = reloading.VersionedState(
+    'datos',
+    [Model.DATA_ARROW_PATH, Model.DATA_CSV_PATH],
+    load=lambda: Model.load_well_data(query_cache),
+    version=lambda well_data: well_data.version,
+    validate=Model.validate_well_data,
+)
+# Al cambiar de versión se descartan las consultas y figuras de la anterior
+data.add_listener(lambda new, old: old is not None and query_cache.clear())
+data.get()
+data.start()
 
 # Crear la app de Dash con un tema Bootstrap
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.FLATLY])
 app.title = "Visualización de Pozos - Tanzania"
 
-app.layout = dbc.Container([
-    html.H1("🌍 Explorando Pozos en Tanzania", style={'text-align': 'center', 'color': '#2c3e50'}),
-    html.Hr(),
-
-    # Fila de estadísticas clave
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader("Pozos Funcionales", style={'text-align': 'center'}),
-                dbc.CardBody(html.H4(id='functional-count', style={'text-align': 'center', 'color': 'green'}))
-            ], style={'height': '100%'})
-        ], width=4),
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader("Pozos en Reparación", style={'text-align': 'center'}),
-                dbc.CardBody(html.H4(id='repair-count', style={'text-align': 'center', 'color': 'orange'}))
-            ], style={'height': '100%'})
-        ], width=4),
-        dbc.Col([
-            dbc.Card([
-                dbc.CardHeader("Pozos No Funcionales", style={'text-align': 'center'}),
-                dbc.CardBody(html.H4(id='non-functional-count', style={'text-align': 'center', 'color': 'red'}))
-            ], style={'height': '100%'})
-        ], width=4),
-    ], className="mb-4"),
-
-    # Fila de filtros
-    dbc.Row([
-        dbc.Col([
-            html.Label("Seleccione un año:", className="form-label"),
-            dcc.Dropdown(
-                id='year-dropdown',
-                options=[{'label': 'Todos', 'value': ''}] + 
-                         [{'label': str(int(year)), 'value': int(year)} for year in sorted(df['construction_year_imputed'].dropna().unique())],
-                value='',
-                className="form-select"
-            ),
-        ], width=2),
-         dbc.Col([
-            html.Label("Estado del Pozo:", className="form-label"),
-            dcc.Dropdown(
-                id='status-group',
-                options=[{'label': 'Todos', 'value': ''}] + 
-                         [{'label': status, 'value': status} for status in sorted(df['status_group'].dropna().unique())],
-                value='',
-                className="form-select"
-            ),
-        ], width=2),  
-        dbc.Col([
-            html.Label("Calidad del agua:", className="form-label"),
-            dcc.Dropdown(
-                id='water-quality',
-                options=[{'label': 'Todos', 'value': ''}] + 
-                         [{'label': quality, 'value': quality} for quality in sorted(df['quality_group'].dropna().unique())],
-                value='',
-                className="form-select"
-            ),
-        ], width=2),
-        dbc.Col([
-            html.Label("Fuente de agua:", className="form-label"),
-            dcc.Dropdown(
-                id='source',
-                options=[{'label': 'Todos', 'value': ''}] + 
-                         [{'label': source, 'value': source} for source in sorted(df['source'].dropna().unique())],
-                value='',
-                className="form-select"
-            ),
-        ], width=2),
-        dbc.Col([
-            html.Label("Región:", className="form-label"),
-            dcc.Dropdown(
-                id='region',
-                options=[{'label': 'Todos', 'value': ''}] + 
-                         [{'label': region, 'value': region} for region in sorted(df['region'].dropna().unique())],
-                value='',
-                className="form-select"
-            ),
-        ], width=2),
-        dbc.Col([
-            html.Label("Rango de edad del pozo:", className="form-label"),
-            dcc.RangeSlider(
-                id='well-age',
-                min=0,
-                max=70,
-                step=5,
-                marks={i: str(i) for i in range(0, 101, 20)},
-                tooltip={"placement": "bottom", "always_visible": True},
-                value=[0, 70]
-            ),
-        ], width=2),
-    ], className="mb-4"),
-
-    # Fila de gráficos
-    dbc.Row([
-        dbc.Col([
-            dcc.Graph(id='map', style={'height': '300px'}),
-        ], width=9),
-        dbc.Col([
-            dcc.Graph(id='pie-chart', style={'height': '300px'}),
-        ], width=3),
-    ], className="mb-4"),
-
-    # Gráfico de líneas en la parte inferior
-    dbc.Row([
-        dbc.Col([
-            dcc.Graph(id='damaged-over-time', style={'height': '300px'}),
-        ], width=12),
-    ]),
-], fluid=True)
+def serve_layout():
+    # Se evalúa en cada carga de página: las opciones de los filtros son las de los datos activos
+    domains = data.get().domains
+    return dbc.Container([
+        html.H1("🌍 Explorando Pozos en Tanzania", style={'text-align': 'center', 'color': '#2c3e50'}),
+        html.Hr(),
+
+        # Fila de estadísticas clave
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Pozos Funcionales", style={'text-align': 'center'}),
+                    dbc.CardBody(html.H4(id='functional-count', style={'text-align': 'center', 'color': 'green'}))
+                ], style={'height': '100%'})
+            ], width=4),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Pozos en Reparación", style={'text-align': 'center'}),
+                    dbc.CardBody(html.H4(id='repair-count', style={'text-align': 'center', 'color': 'orange'}))
+                ], style={'height': '100%'})
+            ], width=4),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader("Pozos No Funcionales", style={'text-align': 'center'}),
+                    dbc.CardBody(html.H4(id='non-functional-count', style={'text-align': 'center', 'color': 'red'}))
+                ], style={'height': '100%'})
+            ], width=4),
+        ], className="mb-4"),
+
+        # Fila de filtros
+        dbc.Row([
+            dbc.Col([
+                html.Label("Seleccione un año:", className="form-label"),
+                dcc.Dropdown(
+                    id='year-dropdown',
+                    options=[{'label': 'Todos', 'value': ''}] + 
+                             [{'label': str(int(year)), 'value': int(year)} for year in domains['construction_year_imputed']],
+                    value='',
+                    className="form-select"
+                ),
+            ], width=2),
+             dbc.Col([
+                html.Label("Estado del Pozo:", className="form-label"),
+                dcc.Dropdown(
+                    id='status-group',
+                    options=[{'label': 'Todos', 'value': ''}] + 
+                             [{'label': status, 'value': status} for status in domains['status_group']],
+                    value='',
+                    className="form-select"
+                ),
+            ], width=2),  
+            dbc.Col([
+                html.Label("Calidad del agua:", className="form-label"),
+                dcc.Dropdown(
+                    id='water-quality',
+                    options=[{'label': 'Todos', 'value': ''}] + 
+                             [{'label': quality, 'value': quality} for quality in domains['quality_group']],
+                    value='',
+                    className="form-select"
+                ),
+            ], width=2),
+            dbc.Col([
+                html.Label("Fuente de agua:", className="form-label"),
+                dcc.Dropdown(
+                    id='source',
+                    options=[{'label': 'Todos', 'value': ''}] + 
+                             [{'label': source, 'value': source} for source in domains['source']],
+                    value='',
+                    className="form-select"
+                ),
+            ], width=2),
+            dbc.Col([
+                html.Label("Región:", className="form-label"),
+                dcc.Dropdown(
+                    id='region',
+                    options=[{'label': 'Todos', 'value': ''}] + 
+                             [{'label': region, 'value': region} for region in domains['region']],
+                    value='',
+                    className="form-select"
+                ),
+            ], width=2),
+            dbc.Col([
+                html.Label("Rango de edad del pozo:", className="form-label"),
+                dcc.RangeSlider(
+                    id='well-age',
+                    min=0,
+                    max=70,
+                    step=5,
+                    marks={i: str(i) for i in range(0, 101, 20)},
+                    tooltip={"placement": "bottom", "always_visible": True},
+                    value=[0, 70]
+                ),
+            ], width=2),
+        ], className="mb-4"),
+
+        # Fila de gráficos
+        dbc.Row([
+            dbc.Col([
+                dcc.Graph(id='map', style={'height': '300px'}),
+            ], width=9),
+            dbc.Col([
+                dcc.Graph(id='pie-chart', style={'height': '300px'}),
+            ], width=3),
+        ], className="mb-4"),
+
+        # Gráfico de líneas en la parte inferior
+        dbc.Row([
+            dbc.Col([
+                dcc.Graph(id='damaged-over-time', style={'height': '300px'}),
+            ], width=12),
+        ]),
+    ], fluid=True)
+
+
+app.layout = serve_layout
 
 # Callbacks para actualizar los números clave
 @app.callback(
@@ -131,13 +160,7 @@ app.layout = dbc.Container([
 )
 def update_counts(year):
     year = None if year == '' else year
-    filtered_df = Model.filter_wells_for_plot(
-        df,
-        construction_year=year,
-    )
-    functional = filtered_df[filtered_df['status_group'] == 'functional'].shape[0]
-    needs_repair = filtered_df[filtered_df['status_group'] == 'functional needs repair'].shape[0]
-    non_functional = filtered_df[filtered_df['status_group'] == 'non functional'].shape[0]
+    functional, needs_repair, non_functional = data.get().queries.count_status_groups(year)
     return functional, needs_repair, non_functional
 
 
@@ -148,7 +171,13 @@ def update_counts(year):
     Input('damaged-over-time', 'id')
 )
 def update_damaged_chart(_):
-    functional_dict, non_functional_dict = Model.wells_by_year(df)
+    # La serie no depende de los filtros: se construye una vez por versión de los datos
+    queries = data.get().queries
+    return queries.memoize('figure', ('damaged-over-time',), lambda: build_damaged_chart(queries))
+
+
+def build_damaged_chart(queries):
+    functional_dict, non_functional_dict = queries.wells_by_year()
     functional_df = pd.DataFrame(list(functional_dict.items()), columns=['Year', 'Count'])
     functional_df['Status'] = 'Functional'
 
@@ -160,6 +189,10 @@ def update_damaged_chart(_):
     fig.update_layout(yaxis_title="Número de Pozos")
     return fig
 
+# Métricas del callback del mapa: tiempo y bytes enviados al navegador
+map_stats = {'calls': 0, 'total_ms': 0.0, 'last_ms': 0.0, 'last_mode': None,
+             'last_rows': 0, 'last_payload_bytes': 0, 'max_payload_bytes': 0}
+
 # Callback para actualizar el mapa
 @app.callback(
     Output('map', 'figure'),
@@ -168,9 +201,12 @@ def update_damaged_chart(_):
      Input('well-age', 'value'),
      Input('status-group', 'value'),
      Input('year-dropdown', 'value'),
-     Input('source', 'value')]
+     Input('source', 'value'),
+     Input('map', 'relayoutData')]
 )
-def update_map(water_quality, region, well_age, status_group, construction_year, source):
+def update_map(water_quality, region, well_age, status_group, construction_year, source, relayout_data):
+    started = time.perf_counter()
+
     # Cambiar entradas vacías ('') a None
     water_quality = None if water_quality == '' else water_quality
     region = None if region == '' else region
@@ -178,9 +214,8 @@ def update_map(water_quality, region, well_age, status_group, construction_year,
     construction_year = None if construction_year == '' else construction_year
     source = None if source == '' else source
 
-    # Filtrar el DataFrame usando la función del modelo
-    filtered_df = Model.filter_wells_for_plot(
-        df,
+    zoom, bbox = Model.viewport_from_relayout(relayout_data)
+    filters = dict(
         water_quality=water_quality,
         region=region,
         well_age=well_age,
@@ -188,23 +223,91 @@ def update_map(water_quality, region, well_age, status_group, construction_year,
         construction_year=construction_year,
         source=source
     )
-    
-    # Crear el mapa con los datos filtrados
-    fig = px.scatter_mapbox(
-        filtered_df,
-        lat='latitude',
-        lon='longitude',
-        color='status_group',
-        mapbox_style='open-street-map',
-        title="Mapa de Pozos - Tanzania",
-        height=600,
-        zoom=4,
-        center={"lat": -12, "lon": 35.0},  # Centro en Tanzania
-        color_discrete_map={'functional': 'green', 'non functional': 'red', 'functional needs repair':'yellow'}
-    )
-    fig.update_layout(margin={"r":0,"t":40,"l":0,"b":0})
+    viewport = (zoom, None if bbox is None else tuple(round(value, 4) for value in bbox))
+    key = Model.normalize_filters(**filters) + viewport
+    queries = data.get().queries
+    fig, mode, n_rows = queries.memoize('map', key, lambda: build_map(queries, filters, zoom, bbox))
+
+    elapsed = (time.perf_counter() - started) * 1000
+    map_stats['calls'] += 1
+    map_stats['total_ms'] += elapsed
+    map_stats['last_ms'] = elapsed
+    map_stats['last_mode'] = mode
+    map_stats['last_rows'] = n_rows
     return fig
 
+
+def build_map(queries, filters, zoom, bbox):
+    # Filtrar los pozos (filas compartidas con los demás callbacks) y quedarse
+    # con los del área visible usando el índice espacial
+    visible_df = queries.viewport(
+        bbox=bbox,
+        columns=['latitude', 'longitude', 'status_group'],
+        **filters
+    )
+
+    # Con muchos pozos en el área visible se envían grupos en lugar de puntos
+    mode, map_df = Model.aggregate_map_points(visible_df, zoom=zoom)
+
+    color_map = {'functional': 'green', 'non functional': 'red', 'functional needs repair': 'yellow'}
+    if mode == 'points':
+        fig = px.scatter_mapbox(
+            map_df,
+            lat='latitude',
+            lon='longitude',
+            color='status_group',
+            mapbox_style='open-street-map',
+            title="Mapa de Pozos - Tanzania",
+            height=600,
+            zoom=4,
+            center={"lat": -12, "lon": 35.0},  # Centro en Tanzania
+            color_discrete_map=color_map
+        )
+    else:
+        fig = px.scatter_mapbox(
+            map_df,
+            lat='latitude',
+            lon='longitude',
+            color='status_group',
+            size='count',
+            hover_data=Model.STATUS_ORDER,
+            mapbox_style='open-street-map',
+            title="Mapa de Pozos - Tanzania (agrupados por zona)",
+            height=600,
+            zoom=4,
+            center={"lat": -12, "lon": 35.0},  # Centro en Tanzania
+            color_discrete_map=color_map
+        )
+    # uirevision conserva el zoom y la posición del usuario entre actualizaciones
+    fig.update_layout(margin={"r":0,"t":40,"l":0,"b":0}, uirevision='map')
+    return fig, mode, len(map_df)
+
+
+@app.server.after_request
+def record_map_payload(response):
+    # Tamaño de la respuesta que lleva la figura del mapa al navegador
+    if flask.request.path.endswith('_dash-update-component'):
+        body = flask.request.get_json(silent=True) or {}
+        if body.get('output') == 'map.figure':
+            size = response.calculate_content_length() or 0
+            map_stats['last_payload_bytes'] = size
+            map_stats['max_payload_bytes'] = max(map_stats['max_payload_bytes'], size)
+            logger.info("mapa: %s (%d filas), %.1f ms, %d bytes", map_stats['last_mode'],
+                        map_stats['last_rows'], map_stats['last_ms'], size)
+    return response
+
+
+@app.server.route('/debug/stats')
+def debug_stats():
+    return flask.jsonify({'map': map_stats, 'cache': query_cache.stats()})
+
+
+@app.server.route('/version')
+def version_info():
+    well_data = data.get()
+    return flask.jsonify({'data': {**data.stats(), 'source': well_data.source, 'rows': len(well_data.df)}})
+
+
 @app.callback(
     Output('pie-chart', 'figure'),
     [Input('water-quality', 'value'),
@@ -222,9 +325,7 @@ def update_pie_chart(water_quality, region, well_age, status_group, construction
     construction_year = None if construction_year == '' else construction_year
     source = None if source == '' else source
 
-    # Filtrar el DataFrame usando la función del modelo
-    filtered_df = Model.filter_wells_for_plot(
-        df,
+    filters = dict(
         water_quality=water_quality,
         region=region,
         well_age=well_age,
@@ -232,9 +333,15 @@ def update_pie_chart(water_quality, region, well_age, status_group, construction
         construction_year=construction_year,
         source=source
     )
+    key = ('pie-chart',) + Model.normalize_filters(**filters)
+    queries = data.get().queries
+    return queries.memoize('figure', key, lambda: build_pie_chart(queries, filters))
+
 
-    # Calcular porcentajes
-    counts = filtered_df['status_group'].value_counts()
+def build_pie_chart(queries, filters):
+    # Calcular porcentajes a partir del cubo de conteos
+    counts = queries.status_counts(**filters)
+    counts = counts[counts > 0].sort_values(ascending=False)
 
     # Personalizar colores
     color_map = {
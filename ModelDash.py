@@ -1,5 +1,28 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
 import pandas as pd
 
+from spatial import SpatialIndex
+
+# Año de referencia para calcular la edad de los pozos
+CURRENT_YEAR = 2024
+
+# Datos del dashboard: CSV limpio y su versión columnar (Feather sin compresión, se mapea en memoria)
+DATA_CSV_PATH = os.path.join('data', 'pumps_cleaned.csv')
+DATA_ARROW_PATH = os.path.join('data', 'pumps_cleaned.arrow')
+# Clave de los metadatos del archivo columnar con las opciones de los filtros
+DATASET_METADATA_KEY = b'pumps_dashboard'
+# Columnas que usa el dashboard y columnas con lista de opciones en los filtros
+DASH_COLUMNS = ['longitude', 'latitude', 'region', 'quality_group', 'source',
+                'construction_year_imputed', 'status_group']
+DROPDOWN_COLUMNS = ['construction_year_imputed', 'status_group', 'quality_group', 'source', 'region']
+
 
 def count_status_groups(df, year=None):
     """
@@ -84,7 +107,7 @@ def filter_wells_for_plot(df, water_quality=None, region=None, well_age=None,
     
     # Filtrar por rango de edad del pozo
     if well_age:
-        current_year = 2024  # Suponiendo el año actual
+        current_year = CURRENT_YEAR  # Suponiendo el año actual
         filtered_df['well_age'] = current_year - filtered_df['construction_year_imputed']
         filtered_df = filtered_df[
             (filtered_df['well_age'] >= well_age[0]) & 
@@ -107,3 +130,589 @@ def filter_wells_for_plot(df, water_quality=None, region=None, well_age=None,
     plot_data = filtered_df[['longitude', 'latitude', 'status_group']]
     
     return plot_data
+
+
+def data_version(df):
+    """
+    Identificador del contenido del DataFrame (valores, índice y nombres de
+    columnas); sirve para invalidar resultados calculados con otros datos.
+    """
+    row_hashes = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    column_hashes = pd.util.hash_array(np.asarray(df.columns.astype(str), dtype=object))
+    return format(int(row_hashes.sum() ^ column_hashes.sum()), '016x')
+
+
+class WellIndex:
+    """
+    Índice en memoria para filtrar los pozos sin copiar el DataFrame.
+
+    Se construye una sola vez: las columnas de filtro se guardan como códigos
+    enteros con la lista de filas de cada valor, y el año de construcción además
+    ordenado para resolver rangos de edad con búsqueda binaria. Cada consulta
+    parte del conjunto de filas más pequeño y descarta las que no cumplen los
+    demás filtros comparando códigos.
+    """
+
+    FILTER_COLUMNS = {
+        'water_quality': 'quality_group',
+        'region': 'region',
+        'status_group': 'status_group',
+        'construction_year': 'construction_year_imputed',
+        'source': 'source',
+    }
+    PLOT_COLUMNS = ['longitude', 'latitude', 'status_group']
+
+    def __init__(self, df, current_year=CURRENT_YEAR):
+        if 'construction_year_imputed' not in df.columns:
+            raise ValueError("El DataFrame debe contener la columna 'construction_year_imputed'.")
+
+        self.df = df
+        self.n_rows = len(df)
+        self.version = data_version(df)
+        self.current_year = current_year
+        self.index = df.index
+
+        # Códigos enteros (-1 para valores faltantes) y filas por valor
+        self.codes = {}
+        self.categories = {}
+        self.rows_by_code = {}
+        for column in self.FILTER_COLUMNS.values():
+            codes, categories = pd.factorize(df[column], sort=True)
+            self.codes[column] = codes
+            self.categories[column] = categories
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(categories) + 1))
+            self.rows_by_code[column] = [order[bounds[i]:bounds[i + 1]] for i in range(len(categories))]
+
+        # Años ordenados para consultas por rango de edad (los faltantes quedan al final)
+        self.years = df['construction_year_imputed'].to_numpy(dtype=np.float64, na_value=np.nan)
+        self.year_order = np.argsort(self.years, kind='stable')
+        self.sorted_years = self.years[self.year_order]
+
+        self._arrays = {}
+
+    def column(self, name):
+        """Devuelve el arreglo subyacente de la columna (se extrae una sola vez)."""
+        if name not in self._arrays:
+            self._arrays[name] = self.df[name].array
+        return self._arrays[name]
+
+    def _code(self, column, value):
+        return int(self.categories[column].get_indexer([value])[0])
+
+    def filter_rows(self, water_quality=None, region=None, well_age=None,
+                    status_group=None, construction_year=None, source=None):
+        """
+        Devuelve las posiciones (ordenadas) de las filas que cumplen los filtros,
+        con la misma semántica que `filter_wells_for_plot`.
+        """
+        filters = {
+            'water_quality': water_quality,
+            'region': region,
+            'status_group': status_group,
+            'construction_year': construction_year,
+            'source': source,
+        }
+        # (tamaño, filas candidatas) de cada filtro de igualdad
+        candidates = []
+        checks = []
+        for name, value in filters.items():
+            if not value:
+                continue
+            column = self.FILTER_COLUMNS[name]
+            code = self._code(column, value)
+            if code < 0:
+                return np.empty(0, dtype=np.intp)
+            rows = self.rows_by_code[column][code]
+            candidates.append((len(rows), rows))
+            checks.append((self.codes[column], code))
+
+        year_range = None
+        if well_age:
+            year_range = (self.current_year - well_age[1], self.current_year - well_age[0])
+            low = np.searchsorted(self.sorted_years, year_range[0], side='left')
+            high = np.searchsorted(self.sorted_years, year_range[1], side='right')
+            candidates.append((high - low, None))
+
+        if not candidates:
+            return np.arange(self.n_rows)
+
+        _, rows = min(candidates, key=lambda item: item[0])
+        if rows is None:
+            rows = np.sort(self.year_order[low:high])
+
+        for codes, code in checks:
+            rows = rows[codes[rows] == code]
+        if year_range is not None:
+            years = self.years[rows]
+            rows = rows[(years >= year_range[0]) & (years <= year_range[1])]
+        return rows
+
+    def filter(self, columns=None, **filters):
+        """
+        Igual que `filter_wells_for_plot`, pero devuelve solo `columns`
+        (por defecto las necesarias para graficar) de las filas seleccionadas.
+        """
+        rows = self.filter_rows(**filters)
+        columns = columns or self.PLOT_COLUMNS
+        return pd.DataFrame({name: self.column(name)[rows] for name in columns}, index=self.index[rows])
+
+
+
+class WellCube:
+    """
+    Conteos precalculados por (region, quality_group, source,
+    construction_year_imputed, status_group).
+
+    Se construye una sola vez a partir de un `WellIndex`; los contadores, el
+    gráfico de pastel y la serie por año se responden sumando celdas del cubo
+    en lugar de recorrer las filas. Los valores faltantes ocupan la última
+    posición de cada dimensión y nunca cumplen un filtro.
+    """
+
+    DIMENSIONS = ['region', 'quality_group', 'source', 'construction_year_imputed', 'status_group']
+
+    def __init__(self, wells):
+        self.wells = wells
+        self.categories = {dim: wells.categories[dim] for dim in self.DIMENSIONS}
+        shape = tuple(len(self.categories[dim]) + 1 for dim in self.DIMENSIONS)
+
+        # Código -1 (faltante) -> última posición de la dimensión
+        flat = np.zeros(wells.n_rows, dtype=np.int64)
+        for dim, size in zip(self.DIMENSIONS, shape):
+            codes = wells.codes[dim]
+            flat = flat * size + np.where(codes < 0, size - 1, codes)
+        self.counts = np.bincount(flat, minlength=int(np.prod(shape))).reshape(shape)
+
+        years = self.categories['construction_year_imputed']
+        self.years = np.asarray(years, dtype=np.float64)
+
+    def _selection(self, dim, value):
+        """
+        Rango de la dimensión que cumple el filtro de igualdad (todo si no hay
+        filtro, es decir, si `value` es None o ''). Un 0 sí filtra.
+        """
+        if value is None or value == '':
+            return slice(0, len(self.categories[dim]) + 1)
+        code = int(self.categories[dim].get_indexer([value])[0])
+        return slice(code, code + 1) if code >= 0 else slice(0, 0)
+
+    def status_counts(self, water_quality=None, region=None, well_age=None,
+                      status_group=None, construction_year=None, source=None):
+        """
+        Devuelve una Serie con el número de pozos por 'status_group' que cumplen
+        los filtros (misma semántica que `filter_wells_for_plot`).
+        """
+        # Como en `filter_wells_for_plot`, un año 0 no filtra
+        years = self._selection('construction_year_imputed', construction_year or None)
+        if well_age:
+            # Los años están ordenados, así que el rango de edad es un rango contiguo
+            low = np.searchsorted(self.years, self.wells.current_year - well_age[1], side='left')
+            high = np.searchsorted(self.years, self.wells.current_year - well_age[0], side='right')
+            start = max(years.start, low)
+            years = slice(start, max(min(years.stop, high), start))
+
+        statuses = self._selection('status_group', status_group)
+        selection = (
+            self._selection('region', region),
+            self._selection('quality_group', water_quality),
+            self._selection('source', source),
+            years,
+            statuses,
+        )
+        counts = self.counts[selection].sum(axis=(0, 1, 2, 3))
+
+        # Se descarta la posición de los estados faltantes
+        n_statuses = len(self.categories['status_group'])
+        stop = min(statuses.stop, n_statuses)
+        return pd.Series(counts[:max(stop - statuses.start, 0)],
+                         index=self.categories['status_group'][statuses.start:stop])
+
+    def count_status_groups(self, year=None):
+        """
+        Equivalente a `count_status_groups(df, year)` sobre el cubo.
+        """
+        # A diferencia de `status_counts`, un año 0 filtra, como en la función original
+        years = self._selection('construction_year_imputed', year)
+        counts = pd.Series(self.counts[:, :, :, years, :-1].sum(axis=(0, 1, 2, 3)),
+                           index=self.categories['status_group'])
+        return tuple(int(counts.get(status, 0)) for status in
+                     ('functional', 'functional needs repair', 'non functional'))
+
+    def wells_by_year(self):
+        """
+        Equivalente a `wells_by_year(df)`: corte del cubo por año y estado.
+        """
+        by_year_status = self.counts.sum(axis=(0, 1, 2))[:-1, :-1]
+        statuses = list(self.categories['status_group'])
+        valid = self.years >= 60
+        years = self.categories['construction_year_imputed'].tolist()
+        result = []
+        for status in ('functional', 'non functional'):
+            column = by_year_status[:, statuses.index(status)] if status in statuses else np.zeros(len(years))
+            result.append({years[i]: int(column[i]) for i in np.flatnonzero(valid & (column > 0))})
+        return tuple(result)
+
+
+# Número de pozos a partir del cual el mapa muestra grupos en lugar de puntos
+MAP_POINT_THRESHOLD = 5000
+# Celdas de la grilla por cada tesela del mapa (256 px): a zoom z la celda mide 360 / 2**z / 32 grados
+MAP_CELLS_PER_TILE = 32
+STATUS_ORDER = ['functional', 'functional needs repair', 'non functional']
+
+
+def viewport_from_relayout(relayout_data, default_zoom=4):
+    """
+    Extrae el zoom y el rectángulo visible (lon_min, lat_min, lon_max, lat_max)
+    del `relayoutData` del mapa. El rectángulo es None si no se conoce.
+    """
+    relayout_data = relayout_data or {}
+    zoom = relayout_data.get('mapbox.zoom', default_zoom)
+    bbox = None
+    corners = (relayout_data.get('mapbox._derived') or {}).get('coordinates')
+    if corners:
+        lons = [corner[0] for corner in corners]
+        lats = [corner[1] for corner in corners]
+        bbox = (min(lons), min(lats), max(lons), max(lats))
+    return zoom, bbox
+
+
+def aggregate_map_points(plot_df, zoom=4, bbox=None, threshold=MAP_POINT_THRESHOLD):
+    """
+    Prepara los pozos para el mapa según cuántos hay en el área visible.
+
+    Si hay `threshold` pozos o menos, devuelve ('points', pozos). Si hay más,
+    los agrupa en una grilla cuyo tamaño de celda depende del zoom y devuelve
+    ('clusters', grupos), con el centroide, el total y el conteo por estado de
+    cada celda, y el estado mayoritario en 'status_group'.
+    """
+    longitude = plot_df['longitude'].to_numpy(dtype=np.float64)
+    latitude = plot_df['latitude'].to_numpy(dtype=np.float64)
+    if bbox is not None:
+        visible = ((longitude >= bbox[0]) & (longitude <= bbox[2]) &
+                   (latitude >= bbox[1]) & (latitude <= bbox[3]))
+        plot_df = plot_df[visible]
+        longitude, latitude = longitude[visible], latitude[visible]
+
+    if len(plot_df) <= threshold:
+        return 'points', plot_df
+
+    cell = 360.0 / (2 ** zoom) / MAP_CELLS_PER_TILE
+    cell_x = np.floor(longitude / cell).astype(np.int64)
+    cell_y = np.floor(latitude / cell).astype(np.int64)
+    keys = (cell_x - cell_x.min()) * (cell_y.max() - cell_y.min() + 1) + (cell_y - cell_y.min())
+    _, inverse = np.unique(keys, return_inverse=True)
+    n_cells = int(inverse.max()) + 1
+
+    status_codes = pd.Categorical(plot_df['status_group'], categories=STATUS_ORDER).codes
+    known = status_codes >= 0
+    by_status = np.bincount(
+        inverse[known] * len(STATUS_ORDER) + status_codes[known], minlength=n_cells * len(STATUS_ORDER)
+    ).reshape(n_cells, len(STATUS_ORDER))
+    counts = np.bincount(inverse, minlength=n_cells)
+
+    clusters = pd.DataFrame({
+        'longitude': np.bincount(inverse, weights=longitude, minlength=n_cells) / counts,
+        'latitude': np.bincount(inverse, weights=latitude, minlength=n_cells) / counts,
+        'count': counts,
+    })
+    for i, status in enumerate(STATUS_ORDER):
+        clusters[status] = by_status[:, i]
+    clusters['status_group'] = np.asarray(STATUS_ORDER, dtype=object)[by_status.argmax(axis=1)]
+    return 'clusters', clusters
+
+
+# Entradas máximas del caché de consultas del dashboard y archivo opcional donde persistirlo
+DASH_CACHE_SIZE = int(os.environ.get('DASH_CACHE_SIZE', '256'))
+DASH_CACHE_PATH = os.environ.get('DASH_CACHE_PATH') or None
+
+
+def normalize_filters(water_quality=None, region=None, well_age=None,
+                      status_group=None, construction_year=None, source=None):
+    """
+    Convierte los valores de los filtros en una tupla canónica: '' equivale a
+    None, la edad se vuelve tupla de enteros y el año un entero.
+    """
+    def clean(value):
+        return None if value in ('', None) else value
+
+    return (
+        clean(water_quality),
+        clean(region),
+        tuple(int(age) for age in well_age) if well_age else None,
+        clean(status_group),
+        None if clean(construction_year) is None else int(construction_year),
+        clean(source),
+    )
+
+
+FILTER_NAMES = ['water_quality', 'region', 'well_age', 'status_group', 'construction_year', 'source']
+
+
+class QueryCache:
+    """
+    Caché LRU de resultados del dashboard, compartido entre callbacks.
+
+    Las claves son tuplas cuyo primer elemento es el tipo de consulta ('rows',
+    'pie', 'map', ...), que se usa para contar aciertos y fallos por tipo. Si se
+    indica `path`, el contenido se carga al crearlo y se guarda con `save`.
+    """
+
+    def __init__(self, max_entries=DASH_CACHE_SIZE, path=DASH_CACHE_PATH):
+        self.max_entries = max_entries
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = Counter()
+        self.misses = Counter()
+        if path:
+            self.load()
+
+    def get(self, key, compute):
+        """Devuelve el valor de `key`, calculándolo con `compute()` si no está."""
+        kind = key[0]
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits[kind] += 1
+                return self._entries[key]
+        value = compute()
+        with self._lock:
+            self.misses[kind] += 1
+            if self.max_entries > 0:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def load(self):
+        """Carga las entradas guardadas en `path`; un archivo ilegible se ignora."""
+        try:
+            with open(self.path, 'rb') as f:
+                items = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return
+        with self._lock:
+            self._entries.update(items[-self.max_entries:] if self.max_entries > 0 else [])
+
+    def save(self):
+        """Guarda las entradas en `path` (se escribe a un temporal y se reemplaza)."""
+        if not self.path:
+            return
+        with self._lock:
+            items = list(self._entries.items())
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(items, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+    def stats(self):
+        kinds = sorted(set(self.hits) | set(self.misses))
+        by_kind = {
+            kind: {
+                'hits': self.hits[kind],
+                'misses': self.misses[kind],
+                'hit_rate': self.hits[kind] / (self.hits[kind] + self.misses[kind]),
+            }
+            for kind in kinds
+        }
+        hits, misses = sum(self.hits.values()), sum(self.misses.values())
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'path': self.path,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'by_kind': by_kind,
+        }
+
+
+class WellQueries:
+    """
+    Consultas del dashboard memorizadas en un `QueryCache`.
+
+    Todas las claves incluyen la versión de los datos y la tupla normalizada de
+    filtros, de modo que el mapa, el pastel y los contadores de una misma
+    interacción reutilizan el mismo resultado y nunca mezclan datos distintos.
+    """
+
+    def __init__(self, wells, cube, cache=None, spatial=None):
+        self.wells = wells
+        self.cube = cube
+        self.cache = cache if cache is not None else QueryCache()
+        self.spatial = spatial
+
+    @property
+    def version(self):
+        return self.wells.version
+
+    def memoize(self, kind, key, compute):
+        """Memoriza `compute()` bajo (kind, versión de los datos, *key)."""
+        return self.cache.get((kind, self.version) + tuple(key), compute)
+
+    def filter_rows(self, **filters):
+        key = normalize_filters(**filters)
+        return self.memoize('rows', key, lambda: self.wells.filter_rows(**dict(zip(FILTER_NAMES, key))))
+
+    def filter(self, columns=None, **filters):
+        rows = self.filter_rows(**filters)
+        columns = columns or self.wells.PLOT_COLUMNS
+        return pd.DataFrame({name: self.wells.column(name)[rows] for name in columns},
+                            index=self.wells.index[rows])
+
+    def viewport_rows(self, bbox=None, **filters):
+        """
+        Posiciones de las filas que cumplen los filtros dentro del rectángulo
+        `bbox` (lon_min, lat_min, lon_max, lat_max), en orden de longitud.
+        Sin rectángulo equivale a `filter_rows`.
+        """
+        rows = self.filter_rows(**filters)
+        if bbox is None:
+            return rows
+        if self.spatial is None:
+            self.spatial = SpatialIndex(self.wells.column('longitude'), self.wells.column('latitude'))
+        visible = self.spatial.bbox(*bbox)
+        if len(rows) == self.wells.n_rows:
+            return visible
+        selected = np.zeros(self.wells.n_rows, dtype=bool)
+        selected[rows] = True
+        return visible[selected[visible]]
+
+    def viewport(self, bbox=None, columns=None, **filters):
+        """Como `filter`, pero solo con los pozos dentro del rectángulo `bbox`."""
+        rows = self.viewport_rows(bbox, **filters)
+        columns = columns or self.wells.PLOT_COLUMNS
+        return pd.DataFrame({name: self.wells.column(name)[rows] for name in columns},
+                            index=self.wells.index[rows])
+
+    def status_counts(self, **filters):
+        key = normalize_filters(**filters)
+        return self.memoize('pie', key, lambda: self.cube.status_counts(**dict(zip(FILTER_NAMES, key))))
+
+    def count_status_groups(self, year=None):
+        year = None if year in ('', None) else int(year)
+        return self.memoize('counts', (year,), lambda: self.cube.count_status_groups(year))
+
+    def wells_by_year(self):
+        return self.memoize('by_year', (), self.cube.wells_by_year)
+
+
+def file_sha256(path):
+    """Devuelve el SHA-256 del archivo en `path`."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def dropdown_domains(df):
+    """Valores ordenados (sin faltantes) de cada columna con filtro desplegable."""
+    domains = {}
+    for column in DROPDOWN_COLUMNS:
+        values = sorted(df[column].dropna().unique().tolist())
+        if column == 'construction_year_imputed':
+            values = [int(value) for value in values]
+        domains[column] = values
+    return domains
+
+
+def convert_dataset(csv_path=DATA_CSV_PATH, out_path=DATA_ARROW_PATH):
+    """
+    Escribe el CSV limpio en formato columnar tipado: categóricas para las
+    columnas de texto, float32 para las coordenadas e int16 para los años. Los
+    metadatos guardan las opciones de los filtros y el hash del CSV de origen.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    df = pd.read_csv(csv_path)
+    for column in df.columns:
+        if df[column].dtype == object or pd.api.types.is_string_dtype(df[column]):
+            df[column] = df[column].astype('category')
+    df['longitude'] = df['longitude'].astype(np.float32)
+    df['latitude'] = df['latitude'].astype(np.float32)
+    year_dtype = 'Int16' if df['construction_year_imputed'].isna().any() else np.int16
+    df['construction_year_imputed'] = df['construction_year_imputed'].astype(year_dtype)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[DATASET_METADATA_KEY] = json.dumps({
+        'dropdowns': dropdown_domains(df),
+        'rows': len(df),
+        'source_sha256': file_sha256(csv_path),
+    }).encode()
+    table = table.replace_schema_metadata(metadata)
+    # Sin compresión para poder mapear el archivo en memoria al cargarlo
+    feather.write_feather(table, out_path, compression='uncompressed')
+    return json.loads(metadata[DATASET_METADATA_KEY])
+
+
+def load_dataset(columns=DASH_COLUMNS, path=DATA_ARROW_PATH, csv_path=DATA_CSV_PATH):
+    """
+    Carga las columnas `columns` de los pozos y las opciones de los filtros.
+
+    Usa el archivo columnar mapeado en memoria si existe y corresponde al CSV
+    actual (o si no hay CSV); si no, lee el CSV. Devuelve (df, opciones, origen),
+    con origen 'arrow' o 'csv'.
+    """
+    if os.path.exists(path):
+        import pyarrow.feather as feather
+
+        table = feather.read_table(path, columns=columns, memory_map=True)
+        info = json.loads((table.schema.metadata or {}).get(DATASET_METADATA_KEY, b'{}'))
+        fresh = not os.path.exists(csv_path) or info.get('source_sha256') == file_sha256(csv_path)
+        if 'dropdowns' in info and fresh:
+            return table.to_pandas(split_blocks=True, self_destruct=True), info['dropdowns'], 'arrow'
+
+    df = pd.read_csv(csv_path, usecols=columns)
+    return df, dropdown_domains(df), 'csv'
+
+
+class WellData:
+    """
+    Datos del dashboard junto con sus índices. Se construyen juntos y se
+    reemplazan juntos cuando se recargan los datos.
+    """
+
+    def __init__(self, df, domains, source, cache=None):
+        self.df = df
+        self.domains = domains
+        self.source = source
+        self.wells = WellIndex(df)
+        self.cube = WellCube(self.wells)
+        self.spatial = SpatialIndex(df['longitude'], df['latitude'])
+        self.queries = WellQueries(self.wells, self.cube, cache, self.spatial)
+        self.version = self.wells.version
+
+
+def load_well_data(cache=None, path=DATA_ARROW_PATH, csv_path=DATA_CSV_PATH):
+    """Carga los datos con `load_dataset` y construye sus índices."""
+    df, domains, source = load_dataset(path=path, csv_path=csv_path)
+    return WellData(df, domains, source, cache)
+
+
+def validate_well_data(candidate, current=None):
+    """
+    Verifica que unos datos recargados puedan reemplazar a los activos: no
+    vacíos, con las columnas del dashboard, coordenadas válidas y estados
+    conocidos.
+    """
+    df = candidate.df
+    missing = [column for column in DASH_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Faltan columnas en los datos: {missing}")
+    if len(df) == 0:
+        raise ValueError("Los datos no tienen filas")
+    for column in ('longitude', 'latitude'):
+        if not pd.api.types.is_numeric_dtype(df[column]):
+            raise ValueError(f"La columna {column} no es numérica")
+    unknown = set(df['status_group'].dropna().unique()) - set(STATUS_ORDER)
+    if unknown:
+        raise ValueError(f"Estados desconocidos en status_group: {sorted(unknown)}")
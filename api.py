@@ -1,10 +1,132 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, HTTPException, Query, Request, UploadFile
+from fastapi.exception_handlers import http_exception_handler, request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.routing import APIRoute
 from pydantic import BaseModel
-from typing import List
+from typing import Any, List, Optional
+import numpy as np
 import pandas as pd
-from model import predict_pump_status
+from model import (CATEGORICAL_COLUMNS, FEATURE_FIELDS, STATUS_ARRAY, STATUS_GROUPS, build_explanations,
+                   build_predictions, explanation_cache, get_model, model_state, prediction_cache)
+from bulk import DEFAULT_CHUNKSIZE, OUTPUT_MEDIA_TYPES, detect_format, format_chunk, format_error, iter_chunks
+import serving
+from batching import BATCH_WAIT_MS, MicroBatcher
+from serialization import DECODERS, ENCODERS, JSON_MEDIA_TYPE, dumps, media_type_of, negotiate
+from ModelDash import DATA_ARROW_PATH, DATA_CSV_PATH, data_version, load_dataset
+from reloading import VersionedState
+from spatial import PumpLocations
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException as StarletteHTTPException
+import metrics
+from metrics import CallbackMetric, MetricsMiddleware, observe_stage, record_batch, record_error, stage
 
-app = FastAPI()
+# Agrupador de solicitudes de un solo registro (solo si PUMP_BATCH_WAIT_MS > 0)
+batcher = MicroBatcher(serving.predict_probabilities) if BATCH_WAIT_MS > 0 else None
+
+
+def load_pump_locations():
+    df, _, _ = load_dataset(columns=None)
+    return PumpLocations(df, data_version(df))
+
+
+# Inventario de bombas con su índice espacial para las consultas de /pumps. Se
+# carga con la primera consulta y se recarga cuando cambian los archivos de datos.
+pumps_state = VersionedState(
+    "bombas",
+    [DATA_ARROW_PATH, DATA_CSV_PATH],
+    load=load_pump_locations,
+    version=lambda pumps: pumps.version,
+)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    loop = asyncio.get_running_loop()
+
+    def on_model_swap(loaded, old):
+        # Los procesos tienen su propia copia del modelo: se recrean desde el event loop
+        if old is not None:
+            loop.call_soon_threadsafe(serving.restart)
+
+    model_state.add_listener(on_model_swap)
+    # Pools de procesos para predecir (solo si PUMP_WORKERS > 0)
+    serving.start()
+    # Recarga en caliente del modelo (cada PUMP_RELOAD_INTERVAL segundos)
+    model_state.start()
+    pumps_state.start()
+    yield
+    pumps_state.stop()
+    model_state.stop()
+    model_state.listeners.remove(on_model_swap)
+    if batcher is not None:
+        await batcher.stop()
+    serving.shutdown()
+
+
+class DecodedRequest(Request):
+    """Solicitud cuyo cuerpo (msgpack o Arrow) ya fue decodificado a la estructura del JSON."""
+
+    def __init__(self, scope, receive, body, decoded):
+        super().__init__(scope, receive)
+        self._body = body
+        self._decoded = decoded
+
+    async def json(self):
+        return self._decoded
+
+
+class NegotiatedRoute(APIRoute):
+    """
+    Ruta que acepta cuerpos msgpack y Arrow además de JSON. El cuerpo se
+    decodifica a la misma estructura que el JSON y pasa por la validación de
+    siempre del modelo de Pydantic.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        body_model = self.body_field.field_info.annotation if self.body_field is not None else None
+        records = body_model is not None and list(getattr(body_model, "model_fields", {})) == ["data"]
+
+        async def route_handler(request):
+            # Inicio de la solicitud, para medir la lectura y validación del cuerpo
+            request.state.received = time.perf_counter()
+            decoder = DECODERS.get(media_type_of(request.headers.get("content-type")))
+            if decoder is None:
+                return await handler(request)
+            body = await request.body()
+            try:
+                decoded = decoder(body, records=records)
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"No se pudo decodificar el cuerpo: {e}")
+            # Se presenta como JSON para que FastAPI valide el contenido decodificado
+            headers = [(key, value) for key, value in request.scope["headers"] if key != b"content-type"]
+            scope = dict(request.scope, headers=headers + [(b"content-type", b"application/json")])
+            return await handler(DecodedRequest(scope, request.receive, body, decoded))
+
+        return route_handler
+
+
+app = FastAPI(lifespan=lifespan)
+app.router.route_class = NegotiatedRoute
+app.add_middleware(MetricsMiddleware)
+
+
+@app.exception_handler(RequestValidationError)
+async def validation_error_handler(request, exc):
+    record_error(metrics.endpoint_of(request.scope), type(exc).__name__)
+    return await request_validation_exception_handler(request, exc)
+
+
+@app.exception_handler(StarletteHTTPException)
+async def http_error_handler(request, exc):
+    # Los 500 ya se contaron con el tipo de la excepción original
+    if exc.status_code != 500:
+        record_error(metrics.endpoint_of(request.scope), f"HTTP{exc.status_code}")
+    return await http_exception_handler(request, exc)
 
 # Clase para validar la entrada
 class PumpRecord(BaseModel):
@@ -28,11 +150,427 @@ class PumpRecord(BaseModel):
 class PumpData(BaseModel):
     data: List[PumpRecord]
 
+# Entrada columnar: una lista por campo de `PumpRecord`. Los tipos y dominios se
+# validan sobre el arreglo completo en `columns_to_frame`, sin crear un objeto por fila.
+class PumpColumns(BaseModel):
+    id: List[Any]
+    longitude: List[Any]
+    latitude: List[Any]
+    region: List[Any]
+    extraction_type: List[Any]
+    management: List[Any]
+    payment_type: List[Any]
+    quality_group: List[Any]
+    quantity_group: List[Any]
+    source: List[Any]
+    waterpoint_type: List[Any]
+    population_imputed: List[Any]
+    altitud: List[Any]
+    construction_year_imputed: List[Any]
+    imputed_scheme__management: List[Any]
+    imputed_permit: List[Any]
+
+# Rangos válidos para las columnas numéricas
+VALUE_RANGES = {
+    "latitude": (-90.0, 90.0),
+    "longitude": (-180.0, 180.0),
+    "altitud": (-500.0, 6000.0),
+}
+
+
+def columns_to_frame(data: PumpColumns):
+    """
+    Valida la entrada columnar con operaciones sobre arreglos completos y la
+    convierte en un DataFrame con los mismos tipos que produce `PumpRecord`.
+    """
+    lengths = {field: len(getattr(data, field)) for field in PumpRecord.model_fields}
+    if len(set(lengths.values())) > 1:
+        raise HTTPException(status_code=422, detail=f"Todas las columnas deben tener la misma longitud: {lengths}")
+    return validate_columns({field: getattr(data, field) for field in PumpRecord.model_fields})
+
+
+def validate_columns(source):
+    """
+    Valida tipos, rangos y categorías de los campos de `PumpRecord` de
+    `source` (un diccionario de listas o un DataFrame) y devuelve un
+    DataFrame solo con esos campos. Lanza un 422 con todos los errores.
+    """
+    errors = []
+    columns = {}
+    for field, info in PumpRecord.model_fields.items():
+        values = source[field]
+        if isinstance(values, pd.Series) and isinstance(values.dtype, pd.CategoricalDtype):
+            # Columnas de diccionario de Parquet
+            values = values.astype(object)
+        if info.annotation is str:
+            if pd.api.types.infer_dtype(values, skipna=False) not in ("string", "empty"):
+                errors.append(f"{field}: se esperaban textos")
+                continue
+            columns[field] = np.asarray(values, dtype=object)
+        elif info.annotation is bool:
+            if pd.api.types.infer_dtype(values, skipna=False) not in ("boolean", "empty"):
+                errors.append(f"{field}: se esperaban booleanos")
+                continue
+            columns[field] = np.asarray(values, dtype=bool)
+        else:
+            if pd.api.types.infer_dtype(values, skipna=False) not in ("integer", "floating", "mixed-integer-float", "empty"):
+                errors.append(f"{field}: se esperaban números")
+                continue
+            array = np.asarray(values, dtype=np.float64)
+            if not np.isfinite(array).all():
+                errors.append(f"{field}: contiene valores no finitos")
+                continue
+            if info.annotation is int:
+                if (array != np.round(array)).any():
+                    errors.append(f"{field}: se esperaban enteros")
+                    continue
+                array = array.astype(np.int64)
+            columns[field] = array
+
+    for field, (low, high) in VALUE_RANGES.items():
+        if field in columns and ((columns[field] < low) | (columns[field] > high)).any():
+            errors.append(f"{field}: valores fuera del rango [{low}, {high}]")
+
+    encoder = get_model().encoder
+    for field in CATEGORICAL_COLUMNS:
+        if field in columns:
+            unknown = encoder.unknown_levels(field, columns[field])
+            if unknown:
+                errors.append(f"{field}: categorías desconocidas {unknown[:10]}")
+
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+    return pd.DataFrame(columns)
+
+
+def response_media_type(request: Request):
+    """Formato de respuesta según el encabezado Accept (406 si no se soporta ninguno)."""
+    media_type = negotiate(request.headers.get("accept"))
+    if media_type is None:
+        raise HTTPException(status_code=406, detail=f"Formatos soportados: {sorted(ENCODERS)}")
+    return media_type
+
+
+def encode_predictions(ids, probabilities, columnar, media_type):
+    return Response(content=ENCODERS[media_type](ids, probabilities, columnar=columnar), media_type=media_type)
+
+
+def records_to_frame(data):
+    """
+    DataFrame con una fila por `PumpRecord`. Las columnas se fijan de antemano
+    para que un lote vacío también tenga `id` y los demás campos.
+    """
+    return pd.DataFrame([record.dict() for record in data.data], columns=list(PumpRecord.model_fields))
+
+
+async def score(input_df):
+    """
+    Calcula las probabilidades; los registros individuales pasan por el agrupador si está activo.
+    """
+    if batcher is not None and len(input_df) == 1:
+        return await batcher.submit(input_df)
+    return await serving.predict_probabilities(input_df)
+
+
 @app.post("/predict")
-def predict(data: PumpData):
+async def predict(data: PumpData, request: Request, columnar: bool = False):
+    observe_stage("validation", time.perf_counter() - request.state.received)
+    media_type = response_media_type(request)
+    try:
+        with stage("frame"):
+            input_df = records_to_frame(data)
+        record_batch("/predict", len(input_df))
+        with stage("score"):
+            probabilities = await score(input_df)
+        with stage("response"):
+            return encode_predictions(input_df["id"], probabilities, columnar, media_type)
+    except Exception as e:
+        record_error("/predict", type(e).__name__)
+        raise HTTPException(status_code=500, detail=f"Error en la predicción ({type(e).__name__}): {e}")
+
+
+@app.post("/predict/columns")
+async def predict_columns(data: PumpColumns, request: Request, columnar: bool = False):
+    observe_stage("validation", time.perf_counter() - request.state.received)
+    media_type = response_media_type(request)
+    with stage("frame"):
+        input_df = columns_to_frame(data)
+    record_batch("/predict/columns", len(input_df))
+    try:
+        with stage("score"):
+            probabilities = await score(input_df)
+        with stage("response"):
+            return encode_predictions(input_df["id"], probabilities, columnar, media_type)
+    except Exception as e:
+        record_error("/predict/columns", type(e).__name__)
+        raise HTTPException(status_code=500, detail=f"Error en la predicción ({type(e).__name__}): {e}")
+
+
+@app.post("/explain")
+async def explain(data: PumpData, request: Request, k: int = Query(5, ge=1, le=50),
+                  status: Optional[str] = None, approximate: bool = False):
+    """
+    Explica las predicciones con las contribuciones SHAP de XGBoost sumadas por
+    campo de `PumpRecord`: por bomba, los `k` campos que más empujan hacia el
+    estado predicho (o hacia `status`), en escala de log-odds. Con
+    `approximate=true` se usan las contribuciones aproximadas, mucho más rápidas.
+    """
+    observe_stage("validation", time.perf_counter() - request.state.received)
+    if status is not None and status not in STATUS_GROUPS:
+        raise HTTPException(status_code=422, detail=f"status debe ser uno de {STATUS_GROUPS}")
+    try:
+        with stage("frame"):
+            input_df = records_to_frame(data)
+        record_batch("/explain", len(input_df))
+        with stage("score"):
+            contributions = await serving.explain_contributions(input_df, approximate)
+        with stage("response"):
+            explanations = build_explanations(input_df, contributions, get_model().encoder.fields, k, status)
+            return Response(content=dumps(explanations), media_type=JSON_MEDIA_TYPE)
+    except Exception as e:
+        record_error("/explain", type(e).__name__)
+        raise HTTPException(status_code=500, detail=f"Error en la explicación ({type(e).__name__}): {e}")
+
+
+@app.post("/predict/bulk")
+async def predict_bulk(file: UploadFile = File(...), output: str = "csv", chunksize: int = DEFAULT_CHUNKSIZE):
+    """
+    Predice un archivo CSV o Parquet por bloques y devuelve los resultados en
+    streaming (CSV o NDJSON), sin cargar el archivo completo en memoria.
+
+    Cada bloque se valida como `/predict/columns`. Un error en el primer bloque
+    se responde con 422; en los siguientes, la respuesta ya empezó, así que se
+    agrega un registro de error y se corta el archivo.
+    """
+    if output not in OUTPUT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Formato de salida no soportado: {output}")
+    if chunksize <= 0:
+        raise HTTPException(status_code=400, detail="chunksize debe ser mayor que cero")
+
     try:
-        input_df = pd.DataFrame([record.dict() for record in data.data])
-        predictions = predict_pump_status(input_df)
-        return predictions
+        chunks = iter_chunks(file.file, detect_format(file.filename), chunksize)
+        # Se lee el primer bloque antes de responder para poder devolver errores con su código
+        first_chunk = await run_in_threadpool(next, chunks, None)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error en la predicción: {e}")
+        raise HTTPException(status_code=400, detail=f"No se pudo leer el archivo: {e}")
+
+    if first_chunk is not None:
+        missing = [col for col in PumpRecord.model_fields if col not in first_chunk.columns]
+        if missing:
+            chunks.close()
+            raise HTTPException(status_code=422, detail=f"Faltan columnas en el archivo: {missing}")
+        try:
+            first_chunk = await run_in_threadpool(validate_columns, first_chunk)
+        except HTTPException:
+            chunks.close()
+            raise
+
+    async def generate():
+        chunk, header, index = first_chunk, True, 0
+        # El lector se cierra al terminar, ante un error o si el cliente se desconecta
+        try:
+            while chunk is not None:
+                if index > 0:
+                    try:
+                        chunk = await run_in_threadpool(validate_columns, chunk)
+                    except HTTPException as e:
+                        record_error("/predict/bulk", "HTTP422")
+                        yield format_error(f"bloque {index}: {e.detail}", output=output)
+                        return
+                record_batch("/predict/bulk", len(chunk))
+                # Igual que /predict: con PUMP_WORKERS>0 el bloque se reparte entre los procesos
+                probabilities = await serving.predict_probabilities(chunk)
+                predictions = build_predictions(chunk["id"], probabilities, columnar=True)
+                yield format_chunk(predictions, output=output, header=header)
+                header = False
+                index += 1
+                try:
+                    chunk = await run_in_threadpool(next, chunks, None)
+                except Exception as e:
+                    record_error("/predict/bulk", type(e).__name__)
+                    yield format_error(f"bloque {index}: no se pudo leer el archivo: {e}", output=output)
+                    return
+        finally:
+            chunks.close()
+
+    return StreamingResponse(generate(), media_type=OUTPUT_MEDIA_TYPES[output])
+
+
+def get_pumps():
+    try:
+        return pumps_state.get()
+    except FileNotFoundError:
+        raise HTTPException(status_code=503, detail="No hay datos de bombas para las consultas espaciales")
+
+
+async def pumps_response(pumps, rows, distances=None, predictions=False, status=None, limit=None):
+    """
+    Respuesta de las consultas espaciales: el total de bombas encontradas y
+    hasta `limit` de ellas. Con `predictions` se agregan el estado predicho y
+    sus probabilidades (usando el caché de predicciones) y el conteo por
+    estado predicho de todas las encontradas; `status` deja solo las bombas
+    con ese estado predicho.
+    """
+    body = {"version": pumps.version}
+    predicted = None
+    if predictions and len(rows):
+        missing = [field for field in FEATURE_FIELDS if field not in pumps.df.columns]
+        if missing:
+            raise HTTPException(status_code=503, detail=f"Los datos de bombas no tienen los campos del modelo: {missing}")
+        probabilities = await serving.predict_probabilities(pumps.features(rows))
+        predicted = probabilities.argmax(axis=1)
+        counts = np.bincount(predicted, minlength=len(STATUS_GROUPS))
+        body["predicted_counts"] = dict(zip(STATUS_GROUPS, counts.tolist()))
+        if status is not None:
+            keep = predicted == STATUS_GROUPS.index(status)
+            rows, predicted, probabilities = rows[keep], predicted[keep], probabilities[keep]
+            distances = distances[keep] if distances is not None else None
+    elif predictions:
+        body["predicted_counts"] = dict.fromkeys(STATUS_GROUPS, 0)
+
+    body["count"] = len(rows)
+    if limit is not None:
+        rows = rows[:limit]
+        distances = distances[:limit] if distances is not None else None
+    records = pumps.records(rows, distances)
+    if predicted is not None:
+        for record, code, row in zip(records, predicted, probabilities.astype(float).tolist()):
+            record["predicted_status"] = STATUS_ARRAY[code]
+            record["probabilities"] = dict(zip(STATUS_GROUPS, row))
+    body["pumps"] = records
+    return Response(content=dumps(body), media_type=JSON_MEDIA_TYPE)
+
+
+def check_status(status, predictions):
+    if status is not None and (not predictions or status not in STATUS_GROUPS):
+        raise HTTPException(status_code=422, detail=f"status requiere predictions=true y uno de {STATUS_GROUPS}")
+
+
+@app.get("/pumps/radius")
+async def pumps_radius(
+    longitude: float = Query(..., ge=-180, le=180),
+    latitude: float = Query(..., ge=-90, le=90),
+    radius_km: float = Query(..., gt=0),
+    limit: int = Query(1000, ge=1, le=10000),
+    predictions: bool = False,
+    status: Optional[str] = None,
+):
+    """Bombas a `radius_km` o menos del punto, de la más cercana a la más lejana."""
+    check_status(status, predictions)
+    pumps = get_pumps()
+    with stage("spatial"):
+        rows, distances = pumps.index.radius(longitude, latitude, radius_km)
+    return await pumps_response(pumps, rows, distances, predictions, status, limit)
+
+
+@app.get("/pumps/nearest")
+async def pumps_nearest(
+    longitude: float = Query(..., ge=-180, le=180),
+    latitude: float = Query(..., ge=-90, le=90),
+    k: int = Query(10, ge=1, le=1000),
+    predictions: bool = False,
+):
+    """Las `k` bombas más cercanas al punto."""
+    pumps = get_pumps()
+    with stage("spatial"):
+        rows, distances = pumps.index.nearest(longitude, latitude, k)
+    return await pumps_response(pumps, rows, distances, predictions)
+
+
+@app.get("/pumps/bbox")
+async def pumps_bbox(
+    lon_min: float = Query(..., ge=-180, le=180),
+    lat_min: float = Query(..., ge=-90, le=90),
+    lon_max: float = Query(..., ge=-180, le=180),
+    lat_max: float = Query(..., ge=-90, le=90),
+    limit: int = Query(1000, ge=1, le=10000),
+    predictions: bool = False,
+    status: Optional[str] = None,
+):
+    """
+    Bombas dentro del rectángulo (por ejemplo el área visible de un mapa).
+    Con `lon_min > lon_max` el rectángulo cruza el antimeridiano.
+    """
+    check_status(status, predictions)
+    if lat_min > lat_max:
+        raise HTTPException(status_code=422, detail="lat_min debe ser menor o igual que lat_max")
+    pumps = get_pumps()
+    with stage("spatial"):
+        rows = pumps.index.bbox(lon_min, lat_min, lon_max, lat_max)
+    return await pumps_response(pumps, rows, None, predictions, status, limit)
+
+
+@app.get("/stats")
+def stats():
+    return {
+        "batching": batcher.stats() if batcher is not None else None,
+        "cache": prediction_cache.stats(),
+        "explanation_cache": explanation_cache.stats(),
+    }
+
+
+@app.get("/version")
+def version():
+    loaded = get_model()
+    return {
+        "model": {
+            **model_state.stats(),
+            "source": loaded.source,
+            "backend": loaded.backend_name,
+            "n_features": len(loaded.feature_names),
+        }
+    }
+
+
+@app.post("/version/reload")
+def reload_model():
+    """
+    Revisa ahora los archivos del modelo y lo reemplaza si cambiaron y son válidos.
+    """
+    get_model()
+    reloaded = model_state.check()
+    return {"reloaded": reloaded, **version()}
+
+
+def model_info():
+    loaded = model_state.value
+    if loaded is None:
+        return []
+    return [((loaded.version, loaded.source, loaded.backend_name), 1)]
+
+
+def cache_counters():
+    stats = prediction_cache.stats()
+    return [(("hit",), stats["hits"]), (("miss",), stats["misses"]), (("eviction",), stats["evictions"])]
+
+
+def batcher_counters():
+    if batcher is None:
+        return []
+    stats = batcher.stats()
+    return [(("batches",), stats["batches"]), (("requests",), stats["requests"]), (("rows",), stats["rows"])]
+
+
+metrics.registry.register(CallbackMetric(
+    "pump_model_info", "Modelo activo (valor 1)", "gauge", model_info, labels=("version", "source", "backend")
+))
+metrics.registry.register(CallbackMetric(
+    "pump_model_reloads_total", "Recargas en caliente del modelo", "counter", lambda: [((), model_state.reloads)]
+))
+metrics.registry.register(CallbackMetric(
+    "pump_cache_events_total", "Aciertos, fallos y desalojos del caché de predicciones", "counter",
+    cache_counters, labels=("event",)
+))
+metrics.registry.register(CallbackMetric(
+    "pump_cache_entries", "Entradas en el caché de predicciones", "gauge",
+    lambda: [((), prediction_cache.stats()["entries"])]
+))
+metrics.registry.register(CallbackMetric(
+    "pump_batcher_total", "Lotes, solicitudes y filas del agrupador", "counter", batcher_counters, labels=("kind",)
+))
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Métricas en formato de texto de Prometheus."""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,10 +1,23 @@
+import json
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
 import streamlit as st
 import pandas as pd
 import requests
-import json
+from requests.adapters import HTTPAdapter
 
 # Dirección de la API
 API_URL = "http://127.0.0.1:8000/predict"
+BULK_API_URL = "http://127.0.0.1:8000/predict/bulk"
+
+# Filas por solicitud y solicitudes simultáneas al predecir un archivo
+UPLOAD_CHUNK_ROWS = 5000
+MAX_CONCURRENT_REQUESTS = 4
+# Tiempo máximo de conexión y de respuesta (segundos)
+REQUEST_TIMEOUT = (5, 300)
+# Filas por página en la tabla de resultados
+PAGE_SIZES = [25, 50, 100, 500]
+STATUS_GROUPS = ["functional", "functional needs repair", "non functional"]
 
 # Configuración de Streamlit
 st.title("Predicción del estado de las bombas de agua")
@@ -35,25 +48,138 @@ columns = [
     "imputed_permit",
 ]
 
-# Función para mostrar resultados con formato mejorado
-def display_results(predictions):
-    for pred in predictions:
-        pump_id = pred["pump_id"]
-        status_group = pred["status_group"]
-        probabilities = pred["probabilities"]
-        
-        # Mostrar el ID de la bomba
-        st.subheader(f"Bomba ID: {pump_id}")
-
-        # Mostrar probabilidades en formato de tabla
-        prob_df = pd.DataFrame(list(probabilities.items()), columns=["Estado", "Probabilidad"])
-        prob_df["Probabilidad"] = prob_df["Probabilidad"].apply(lambda x: f"{x * 100:.2f}%")
-        st.write(prob_df)
-
-        # Mostrar el estado predicho con color
-        state_color = get_state_color(status_group)
-        st.markdown(f"**Estado Predicho:** <span style='color:{state_color};'>{status_group}</span>", unsafe_allow_html=True)
-        st.markdown("---")  # Línea divisoria
+@st.cache_resource
+def get_session():
+    """
+    Sesión HTTP compartida entre ejecuciones del script, con un pool de
+    conexiones que se reutilizan entre solicitudes.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENT_REQUESTS)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def predictions_to_frame(predictions):
+    """Convierte la lista de predicciones de la API en una tabla con una columna por probabilidad."""
+    return pd.DataFrame({
+        "pump_id": [pred["pump_id"] for pred in predictions],
+        "status_group": [pred["status_group"] for pred in predictions],
+        **{status: [pred["probabilities"][status] for pred in predictions] for status in STATUS_GROUPS},
+    })
+
+
+def read_chunks(uploaded_file, chunk_rows=UPLOAD_CHUNK_ROWS):
+    """Lee el archivo cargado (CSV o Parquet) por bloques de `chunk_rows` filas."""
+    if uploaded_file.name.lower().endswith((".parquet", ".pq")):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(uploaded_file).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(uploaded_file, chunksize=chunk_rows, dtype={"id": str})
+
+
+def count_rows(uploaded_file):
+    """Número de filas del archivo (aproximado en CSV), para la barra de progreso."""
+    if uploaded_file.name.lower().endswith((".parquet", ".pq")):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(uploaded_file).metadata.num_rows
+    return max(uploaded_file.getvalue().count(b"\n") - 1, 1)
+
+
+def post_chunk(session, chunk):
+    """Envía un bloque a la API y devuelve sus predicciones como tabla."""
+    response = session.post(
+        BULK_API_URL,
+        params={"output": "ndjson"},
+        files={"file": ("bloque.csv", chunk.to_csv(index=False).encode())},
+        timeout=REQUEST_TIMEOUT,
+    )
+    response.raise_for_status()
+    return predictions_to_frame([json.loads(line) for line in response.iter_lines() if line])
+
+
+def predict_file(uploaded_file, on_progress):
+    """
+    Predice el archivo en bloques enviados en paralelo por la misma sesión.
+
+    Llama a `on_progress(resultados)` cada vez que llega un bloque, con los
+    bloques recibidos hasta el momento (por número de bloque), y devuelve la
+    tabla completa en el orden del archivo.
+    """
+    session = get_session()
+    results = {}
+    pending = {}
+
+    def collect(done):
+        for future in done:
+            results[pending.pop(future)] = future.result()
+        on_progress(results)
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as pool:
+        for index, chunk in enumerate(read_chunks(uploaded_file)):
+            # Se limita el número de bloques en vuelo para acotar la memoria
+            if len(pending) >= 2 * MAX_CONCURRENT_REQUESTS:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+            pending[pool.submit(post_chunk, session, chunk)] = index
+        while pending:
+            collect(wait(pending, return_when=FIRST_COMPLETED).done)
+
+    return join_chunks(results)
+
+
+def join_chunks(results):
+    if not results:
+        return predictions_to_frame([])
+    return pd.concat([results[index] for index in sorted(results)], ignore_index=True)
+
+
+# Detalle de una bomba (se muestra solo cuando se solicita)
+def display_pump(pred):
+    # Mostrar el ID de la bomba
+    st.subheader(f"Bomba ID: {pred['pump_id']}")
+
+    # Mostrar probabilidades en formato de tabla
+    prob_df = pd.DataFrame({"Estado": STATUS_GROUPS, "Probabilidad": [pred[status] for status in STATUS_GROUPS]})
+    prob_df["Probabilidad"] = prob_df["Probabilidad"].apply(lambda x: f"{x * 100:.2f}%")
+    st.write(prob_df)
+
+    # Mostrar el estado predicho con color
+    state_color = get_state_color(pred["status_group"])
+    st.markdown(f"**Estado Predicho:** <span style='color:{state_color};'>{pred['status_group']}</span>", unsafe_allow_html=True)
+
+
+# Tabla de resultados paginada y ordenable
+def display_results(results_df):
+    st.subheader(f"Resultados ({len(results_df)} bombas)")
+    if results_df.empty:
+        return
+
+    col_sort, col_order, col_size, col_page = st.columns(4)
+    sort_by = col_sort.selectbox("Ordenar por", list(results_df.columns), index=0)
+    ascending = col_order.radio("Orden", ["Ascendente", "Descendente"]) == "Ascendente"
+    page_size = col_size.selectbox("Filas por página", PAGE_SIZES, index=1)
+    n_pages = max(-(-len(results_df) // page_size), 1)
+    page = col_page.number_input(f"Página (de {n_pages})", min_value=1, max_value=n_pages, value=1)
+
+    sorted_df = results_df.sort_values(sort_by, ascending=ascending, kind="stable")
+    page_df = sorted_df.iloc[(page - 1) * page_size:page * page_size]
+    st.dataframe(
+        page_df,
+        hide_index=True,
+        column_config={
+            status: st.column_config.ProgressColumn(status, format="%.3f", min_value=0.0, max_value=1.0)
+            for status in STATUS_GROUPS
+        },
+    )
+
+    # Detalle bajo demanda de una bomba de la página
+    pump_id = st.selectbox("Ver detalle de la bomba", [""] + page_df["pump_id"].tolist())
+    if pump_id:
+        display_pump(page_df[page_df["pump_id"] == pump_id].iloc[0])
 
 def get_state_color(status):
     """Devuelve el color correspondiente al estado predicho."""
@@ -84,32 +210,40 @@ if option == "Un solo registro":
 
     if st.button("Predecir"):
         try:
-            response = requests.post(API_URL, json={"data": [input_data]})
+            response = get_session().post(API_URL, json={"data": [input_data]}, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()  # Lanza un error si la respuesta no es 200
-            predictions = response.json()
-
-            # Mostrar resultados
-            display_results(predictions)
+            st.session_state["predictions"] = predictions_to_frame(response.json())
 
         except requests.exceptions.RequestException as e:
             st.error(f"Error al conectar con la API: {e}")
 
 elif option == "Múltiples registros (archivo CSV)":
     st.subheader("Subir archivo CSV")
-    uploaded_file = st.file_uploader("Cargue su archivo CSV", type=["csv"])
+    uploaded_file = st.file_uploader("Cargue su archivo CSV o Parquet", type=["csv", "parquet"])
 
     if uploaded_file is not None:
-        data = pd.read_csv(uploaded_file)
-        
         if st.button("Predecir"):
-            try:
-                # Enviar los datos a la API
-                response = requests.post(API_URL, json={"data": data.to_dict(orient="records")})
-                response.raise_for_status()
-                predictions = response.json()
-
-                # Mostrar resultados
-                display_results(predictions)
+            total_rows = count_rows(uploaded_file)
+            progress_bar = st.progress(0.0, text="Enviando bloques...")
+            partial_view = st.empty()
+            received = {}
+
+            # Avance y primeras filas a medida que llegan los bloques
+            def on_progress(results):
+                received.update(results)
+                done_rows = sum(len(chunk) for chunk in results.values())
+                progress_bar.progress(min(done_rows / total_rows, 1.0), text=f"{done_rows} de ~{total_rows} filas")
+                partial_view.dataframe(join_chunks(results).head(PAGE_SIZES[0]), hide_index=True)
 
+            try:
+                st.session_state["predictions"] = predict_file(uploaded_file, on_progress)
             except requests.exceptions.RequestException as e:
                 st.error(f"Error al conectar con la API: {e}")
+                # Se conservan los bloques que alcanzaron a llegar
+                st.session_state["predictions"] = join_chunks(received)
+            progress_bar.empty()
+            partial_view.empty()
+
+# Los resultados se conservan en la sesión para paginar y ver detalles sin volver a predecir
+if "predictions" in st.session_state:
+    display_results(st.session_state["predictions"])
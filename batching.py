@@ -0,0 +1,148 @@
+import asyncio
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Ventana máxima de espera (ms). Con 0, el valor por defecto, no se agrupan solicitudes.
+BATCH_WAIT_MS = float(os.environ.get("PUMP_BATCH_WAIT_MS", "0"))
+# Filas máximas por lote agrupado
+BATCH_MAX_ROWS = int(os.environ.get("PUMP_BATCH_MAX_ROWS", "64"))
+# Lotes agrupados que se predicen a la vez; mientras todos están ocupados las
+# solicitudes se acumulan en la cola y forman el lote siguiente, así que la
+# ventana deja de ser un tope de la espera (ver `slot_wait` en las métricas)
+BATCH_MAX_IN_FLIGHT = int(os.environ.get("PUMP_BATCH_MAX_IN_FLIGHT", "2"))
+
+
+class MicroBatcher:
+    """
+    Agrupa solicitudes concurrentes de pocas filas en un solo lote.
+
+    Cada llamada a `submit` espera como máximo `max_wait_ms` a que se junten
+    otras solicitudes (o hasta reunir `max_batch_size` filas); el lote se predice
+    con una sola llamada a `score` y cada solicitud recibe sus propias filas de
+    la matriz de probabilidades. Si la cola se atrasa, el lote se arma de
+    inmediato con todo lo que ya espera (hasta `max_batch_size`), y nunca hay
+    más de `max_in_flight` lotes prediciéndose a la vez.
+
+    La ventana acota la espera solo mientras haya lugar para otro lote: con
+    los `max_in_flight` lotes ocupados, las solicitudes esperan además a que
+    uno termine. Esa espera se mide aparte (`slot_wait` en `stats`) de la
+    espera dentro de la ventana (`queue_delay`).
+    """
+
+    def __init__(self, score, max_wait_ms=BATCH_WAIT_MS, max_batch_size=BATCH_MAX_ROWS,
+                 max_in_flight=BATCH_MAX_IN_FLIGHT):
+        self.score = score
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.max_in_flight = max(max_in_flight, 1)
+        self._queue = None
+        self._worker = None
+        self._slots = None
+        self._pending = set()
+
+        # Métricas
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+        self.max_rows = 0
+        self.queue_delay_total = 0.0
+        self.queue_delay_max = 0.0
+        self.slot_wait_total = 0.0
+        self.slot_wait_max = 0.0
+
+    async def submit(self, input_df):
+        """
+        Encola `input_df` y devuelve su matriz de probabilidades.
+        """
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+            self._worker = asyncio.create_task(self._collect())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((input_df, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        while True:
+            # Se espera un lugar libre antes de armar el lote: lo que llegue
+            # mientras tanto se acumula en la cola y entra en este lote
+            await self._slots.acquire()
+            acquired = time.perf_counter()
+            items = [await self._queue.get()]
+            n_rows = len(items[0][0])
+            deadline = items[0][2] + self.max_wait
+            while n_rows < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                try:
+                    if timeout <= 0:
+                        # Ventana vencida: solo se toma lo que ya está en la cola
+                        item = self._queue.get_nowait()
+                    else:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                items.append(item)
+                n_rows += len(item[0])
+
+            # El lote se predice en otra tarea para seguir juntando el siguiente
+            task = asyncio.create_task(self._run_batch(items, acquired))
+            self._pending.add(task)
+            task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task):
+        self._pending.discard(task)
+        self._slots.release()
+
+    async def _run_batch(self, items, acquired):
+        started = time.perf_counter()
+        frames = [input_df for input_df, _, _ in items]
+        try:
+            probabilities = await self.score(pd.concat(frames, ignore_index=True))
+        except Exception as e:
+            for _, future, _ in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offsets = np.cumsum([0] + [len(frame) for frame in frames])
+        for (_, future, enqueued), start, stop in zip(items, offsets[:-1], offsets[1:]):
+            # Lo que la solicitud esperó a que se liberara un lote, y el resto de su espera
+            slot_wait = max(acquired - enqueued, 0.0)
+            delay = started - enqueued - slot_wait
+            self.slot_wait_total += slot_wait
+            self.slot_wait_max = max(self.slot_wait_max, slot_wait)
+            self.queue_delay_total += delay
+            self.queue_delay_max = max(self.queue_delay_max, delay)
+            if not future.done():
+                future.set_result(probabilities[start:stop])
+
+        self.batches += 1
+        self.requests += len(items)
+        self.rows += int(offsets[-1])
+        self.max_rows = max(self.max_rows, int(offsets[-1]))
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def stats(self):
+        return {
+            "max_wait_ms": self.max_wait * 1000,
+            "max_batch_size": self.max_batch_size,
+            "max_in_flight": self.max_in_flight,
+            "batches": self.batches,
+            "requests": self.requests,
+            "rows": self.rows,
+            "mean_batch_rows": self.rows / self.batches if self.batches else 0.0,
+            "max_batch_rows": self.max_rows,
+            "mean_queue_delay_ms": self.queue_delay_total / self.requests * 1000 if self.requests else 0.0,
+            "max_queue_delay_ms": self.queue_delay_max * 1000,
+            "mean_slot_wait_ms": self.slot_wait_total / self.requests * 1000 if self.requests else 0.0,
+            "max_slot_wait_ms": self.slot_wait_max * 1000,
+        }
@@ -0,0 +1,75 @@
+"""
+Conformidad y micro-benchmark de los motores de inferencia de `model.BACKENDS`.
+
+Verifica que todos los motores disponibles den las mismas probabilidades que
+`sklearn` (dentro de `--tolerance`) y mide `predict_proba` sobre la matriz ya
+codificada para lotes de 1 a 100k filas. Los motores que no estén instalados
+se omiten.
+
+Uso:
+    python benchmarks/bench_backends.py [--nthread 1]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import model  # noqa: E402
+from synthetic import make_pumps  # noqa: E402
+
+SIZES = (1, 10, 100, 1_000, 10_000, 100_000)
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nthread", type=int, default=None)
+    parser.add_argument("--tolerance", type=float, default=1e-5)
+    args = parser.parse_args()
+
+    loaded = model.get_model()
+    matrix = loaded.encoder.transform(make_pumps(max(SIZES)))
+
+    backends = {}
+    for name in model.BACKENDS:
+        try:
+            loaded.set_backend(name)
+        except ImportError as e:
+            print(f"{name}: no disponible ({e})")
+            continue
+        if args.nthread:
+            loaded.set_nthread(args.nthread)
+        backends[name] = loaded.backend
+
+    reference = backends["sklearn"].predict_proba(matrix)
+    failed = False
+    for name, backend in backends.items():
+        diff = float(np.abs(backend.predict_proba(matrix) - reference).max())
+        ok = diff <= args.tolerance
+        failed |= not ok
+        print(f"{name:>9}: diferencia máxima contra sklearn {diff:.2e} {'OK' if ok else 'FALLA'}")
+
+    print(f"\n{'filas':>8}" + "".join(f"{name + ' (ms)':>18}" for name in backends))
+    for size in SIZES:
+        batch = matrix[:size]
+        repeat = 50 if size <= 100 else 5
+        times = [best_of(lambda: backend.predict_proba(batch), repeat) for backend in backends.values()]
+        print(f"{size:>8}" + "".join(f"{t * 1e3:>18.3f}" for t in times))
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
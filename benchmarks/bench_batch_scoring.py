@@ -0,0 +1,43 @@
+"""
+Escalamiento de `score_batch.py` con el número de procesos.
+
+Genera un inventario sintético, lo predice con 1, 2, 4, ... procesos (hasta
+el número de núcleos) y reporta filas por segundo y la aceleración respecto a
+un solo proceso.
+
+Uso:
+    python benchmarks/bench_batch_scoring.py [filas]
+"""
+import argparse
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import score_batch  # noqa: E402
+from synthetic import make_pumps  # noqa: E402
+
+
+def main(n_rows=200_000, chunksize=10_000):
+    cores = os.cpu_count() or 1
+    workers = sorted({1, cores} | {2 ** i for i in range(1, cores.bit_length()) if 2 ** i <= cores})
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, "inventario.parquet")
+        make_pumps(n_rows).to_parquet(input_path, index=False)
+        base_rate = None
+        for n_workers in workers:
+            args = argparse.Namespace(
+                input=input_path, output_dir=os.path.join(tmp, "salida"), format="parquet",
+                chunksize=chunksize, workers=n_workers, nthread=1, overwrite=True, verbose=False,
+            )
+            rows, elapsed = score_batch.run(args)
+            rate = rows / elapsed
+            base_rate = base_rate or rate
+            print(f"{n_workers:>3} procesos: {rate:12,.0f} filas/s  aceleración {rate / base_rate:4.2f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
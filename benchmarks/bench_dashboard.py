@@ -0,0 +1,108 @@
+"""
+Consistencia y latencia de las consultas del dashboard.
+
+Compara `WellIndex` y `WellCube` con las funciones originales de `ModelDash`
+(`filter_wells_for_plot`, `count_status_groups`, `wells_by_year`) para todas
+las combinaciones de una muestra de filtros, y mide la latencia de los
+callbacks de `Dash.py` (se importa desde la raíz del repositorio, así que
+`data/pumps_cleaned.csv` debe existir).
+
+Uso:
+    python benchmarks/bench_dashboard.py [data/pumps_cleaned.csv]
+"""
+import itertools
+import os
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import ModelDash as Model  # noqa: E402
+
+
+def filter_combinations(df):
+    """Combinaciones de filtros con el primer valor de cada dropdown."""
+    options = {
+        'water_quality': [None, df['quality_group'].dropna().iloc[0]],
+        'region': [None, df['region'].dropna().iloc[0]],
+        'well_age': [None, [0, 70], [10, 30]],
+        'status_group': [None, 'functional'],
+        'construction_year': [None, df['construction_year_imputed'].dropna().iloc[0]],
+        'source': [None, df['source'].dropna().iloc[0]],
+    }
+    for combo in itertools.product(*options.values()):
+        yield dict(zip(options, combo))
+
+
+def check_consistency(df):
+    wells = Model.WellIndex(df)
+    cube = Model.WellCube(wells)
+    failures = 0
+    for filters in filter_combinations(df):
+        expected = Model.filter_wells_for_plot(df, **filters)
+        if not expected.equals(wells.filter(**filters)):
+            failures += 1
+            print(f"WellIndex.filter difiere para {filters}")
+        expected_counts = expected['status_group'].value_counts().sort_index()
+        actual_counts = cube.status_counts(**filters)
+        if not expected_counts.equals(actual_counts[actual_counts > 0].sort_index().rename('count')):
+            failures += 1
+            print(f"WellCube.status_counts difiere para {filters}")
+    for year in [None] + df['construction_year_imputed'].dropna().unique()[:5].tolist():
+        if Model.count_status_groups(df, year) != cube.count_status_groups(year):
+            failures += 1
+            print(f"WellCube.count_status_groups difiere para year={year}")
+    if Model.wells_by_year(df) != cube.wells_by_year():
+        failures += 1
+        print("WellCube.wells_by_year difiere")
+    print(f"Consistencia: {'OK' if failures == 0 else f'{failures} diferencias'}")
+    return failures
+
+
+def best_of(func, repeat=10):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1e3
+
+
+def callback_latency():
+    os.chdir(ROOT)
+    import Dash
+
+    filters = ('', '', [0, 70], '', '', '')
+    print("\nLatencia de callbacks (ms):")
+    print(f"  update_counts       {best_of(lambda: Dash.update_counts('')):8.2f}")
+    print(f"  update_pie_chart    {best_of(lambda: Dash.update_pie_chart(*filters)):8.2f}")
+    print(f"  update_map          {best_of(lambda: Dash.update_map(*filters, None), repeat=3):8.2f}")
+    print(f"  update_damaged_chart{best_of(lambda: Dash.update_damaged_chart(None)):8.2f}")
+
+
+def main(csv_path):
+    df = pd.read_csv(csv_path)
+    failures = check_consistency(df)
+
+    wells = Model.WellIndex(df)
+    cube = Model.WellCube(wells)
+    print("\nConsultas (ms)                 original     índice/cubo")
+    print(f"  contadores (sin filtro)    {best_of(lambda: Model.count_status_groups(df)):10.2f} "
+          f"{best_of(lambda: cube.count_status_groups()):12.3f}")
+    print(f"  pastel (edad 0-70)         "
+          f"{best_of(lambda: Model.filter_wells_for_plot(df, well_age=[0, 70])['status_group'].value_counts()):10.2f} "
+          f"{best_of(lambda: cube.status_counts(well_age=[0, 70])):12.3f}")
+    print(f"  serie por año              {best_of(lambda: Model.wells_by_year(df)):10.2f} "
+          f"{best_of(cube.wells_by_year):12.3f}")
+
+    if (ROOT / 'data' / 'pumps_cleaned.csv').exists():
+        callback_latency()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1] if len(sys.argv) > 1 else str(ROOT / 'data' / 'pumps_cleaned.csv')))
@@ -0,0 +1,76 @@
+"""
+Arranque en frío y memoria residente al cargar los datos del dashboard.
+
+Compara la lectura original (`pd.read_csv` sin tipos), la lectura del CSV con
+solo las columnas usadas (respaldo de `load_dataset`) y el archivo columnar
+mapeado en memoria generado con `convert_dataset.py`. Cada medición corre en un
+proceso nuevo e incluye la construcción del índice y del cubo de conteos.
+
+Uso:
+    python convert_dataset.py
+    python benchmarks/bench_dataset_load.py [repeticiones]
+"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import pandas as pd
+import ModelDash as Model
+imported = time.perf_counter()
+mode = sys.argv[1]
+if mode == "legacy":
+    df = pd.read_csv(Model.DATA_CSV_PATH)
+    domains = {column: sorted(df[column].dropna().unique()) for column in Model.DROPDOWN_COLUMNS}
+elif mode == "csv":
+    df, domains, source = Model.load_dataset(path="no-existe.arrow")
+else:
+    df, domains, source = Model.load_dataset()
+    assert source == "arrow", "falta data/pumps_cleaned.arrow: ejecute convert_dataset.py"
+loaded = time.perf_counter()
+wells = Model.WellIndex(df)
+cube = Model.WellCube(wells)
+ready = time.perf_counter()
+with open("/proc/self/status") as f:
+    rss = next(int(line.split()[1]) for line in f if line.startswith("VmRSS"))
+print(json.dumps({
+    "import": imported - start,
+    "load": loaded - imported,
+    "index": ready - loaded,
+    "total": ready - start,
+    "rss_mb": rss / 1024,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "df_mb": df.memory_usage(deep=True).sum() / 2**20,
+}))
+"""
+
+
+def measure(mode, repeat):
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", PROBE, mode], cwd=ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return runs
+
+
+def main(repeat=5):
+    for mode in ("legacy", "csv", "arrow"):
+        runs = measure(mode, repeat)
+        stats = {key: np.median([run[key] for run in runs]) for key in runs[0]}
+        print(f"{mode:>6}: carga {stats['load'] * 1e3:7.1f} ms  índices {stats['index'] * 1e3:6.1f} ms  "
+              f"total {stats['total'] * 1e3:7.1f} ms  RSS {stats['rss_mb']:6.1f} MB  "
+              f"pico {stats['max_rss_mb']:6.1f} MB  DataFrame {stats['df_mb']:5.1f} MB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
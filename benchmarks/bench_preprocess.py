@@ -0,0 +1,62 @@
+"""
+Compara el codificador precompilado de `model.preprocess_inputs` contra el
+preprocesamiento anterior basado en `pd.get_dummies` (paridad y tiempo).
+
+Uso:
+    python benchmarks/bench_preprocess.py data/pumps_cleaned.csv
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import model  # noqa: E402
+
+
+def legacy_preprocess(input_df, feature_names):
+    """Preprocesamiento original: get_dummies + columnas faltantes una a una."""
+    input_df = input_df.copy()
+    if "imputed_permit" in input_df.columns:
+        input_df["imputed_permit"] = input_df["imputed_permit"].map({True: 1, False: 0}).astype(int)
+    input_df = pd.get_dummies(input_df, drop_first=True)
+    for col in feature_names:
+        if col not in input_df.columns:
+            input_df[col] = 0
+    return input_df[feature_names]
+
+
+def best_of(func, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(csv_path):
+    feature_names = model.get_model().feature_names
+    # `id` se lee numérico: como texto, get_dummies crearía una columna por bomba
+    df = pd.read_csv(csv_path)
+    df = df[[c for c in df.columns if c != "status_group"]]
+
+    expected = legacy_preprocess(df, feature_names).to_numpy(dtype=np.float32)
+    actual = model.preprocess_inputs(df)
+    mismatches = int((~np.isclose(expected, actual, equal_nan=True)).sum())
+    print(f"Paridad sobre {len(df)} filas: {'OK' if mismatches == 0 else f'{mismatches} celdas distintas'}")
+
+    for size in (1, 100, 10_000, len(df)):
+        batch = df.iloc[:size]
+        legacy = best_of(lambda: legacy_preprocess(batch, feature_names))
+        encoder = best_of(lambda: model.preprocess_inputs(batch))
+        print(f"{size:>7} filas  get_dummies: {legacy * 1e3:9.3f} ms  encoder: {encoder * 1e3:9.3f} ms")
+
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1] if len(sys.argv) > 1 else "data/pumps_cleaned.csv"))
@@ -0,0 +1,64 @@
+"""
+Costo por fila de la validación de entrada: `PumpData` (un `PumpRecord` por
+fila) frente a `PumpColumns` validado por arreglos completos.
+
+Mide validación + construcción del DataFrame, sin el modelo. Antes de medir
+verifica que un lote vacío se responda con una lista vacía.
+
+Uso:
+    python benchmarks/bench_request_validation.py
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from api import PumpColumns, PumpData, columns_to_frame, records_to_frame  # noqa: E402
+from synthetic import make_pumps, to_columns, to_records  # noqa: E402
+
+SIZES = (1, 100, 10_000, 100_000)
+
+
+def row_path(payload):
+    return records_to_frame(PumpData.model_validate(payload))
+
+
+def column_path(payload):
+    return columns_to_frame(PumpColumns.model_validate(payload))
+
+
+def best_of(func, payload, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(payload)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def check_empty():
+    """Un lote vacío es válido: cada endpoint responde 200 con una lista vacía."""
+    from fastapi.testclient import TestClient
+
+    import api
+
+    with TestClient(api.app) as client:
+        for path in ("/predict", "/explain"):
+            response = client.post(path, json={"data": []})
+            assert response.status_code == 200 and response.json() == [], (path, response.text)
+
+
+def main():
+    check_empty()
+    print(f"{'filas':>8} {'filas (us/fila)':>16} {'columnas (us/fila)':>19}")
+    for size in SIZES:
+        df = make_pumps(size)
+        repeat = 20 if size <= 100 else 3
+        rows = best_of(row_path, {"data": to_records(df)}, repeat)
+        columns = best_of(column_path, to_columns(df), repeat)
+        print(f"{size:>8} {rows / size * 1e6:>16.2f} {columns / size * 1e6:>19.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Tiempo de codificación y tamaño de la respuesta de `/predict` por formato.
+
+Compara el JSON de FastAPI por defecto (`jsonable_encoder` + `json.dumps`) con
+el JSON de `serialization` (orjson), en registros y en columnas, y con
+msgpack y Arrow IPC, para 10k y 100k filas.
+
+Uso:
+    python benchmarks/bench_serialization.py
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from model import build_predictions  # noqa: E402
+from serialization import encode_arrow, encode_json, encode_msgpack  # noqa: E402
+
+
+def fastapi_default(ids, probabilities, columnar=False):
+    # Lo que hace FastAPI con el valor devuelto por el endpoint antes de este cambio
+    content = jsonable_encoder(build_predictions(ids, probabilities, columnar=columnar))
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+ENCODINGS = {
+    "FastAPI JSON (registros)": fastapi_default,
+    "orjson (registros)": encode_json,
+    "orjson (columnar=true)": lambda ids, probs: encode_json(ids, probs, columnar=True),
+    "msgpack": encode_msgpack,
+    "Arrow IPC": encode_arrow,
+}
+
+
+def timed(encode, ids, probabilities, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payload = encode(ids, probabilities)
+        times.append(time.perf_counter() - start)
+    return np.median(times), len(payload)
+
+
+def main(sizes=(10_000, 100_000), repeat=5):
+    rng = np.random.default_rng(0)
+    for n_rows in sizes:
+        ids = [str(i) for i in range(n_rows)]
+        probabilities = rng.dirichlet(np.ones(3), size=n_rows)
+        print(f"{n_rows} filas")
+        for name, encode in ENCODINGS.items():
+            elapsed, size = timed(encode, ids, probabilities, repeat)
+            print(f"  {name:<26} {elapsed * 1e3:8.1f} ms  {size / 2**20:7.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
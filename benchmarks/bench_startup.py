@@ -0,0 +1,64 @@
+"""
+Latencia desde `import model` hasta la primera predicción, cargando el pickle
+(`PUMP_NATIVE_MODEL=0`) o el booster nativo exportado con `export_model.py`.
+
+Cada medición corre en un proceso nuevo para incluir el costo de importación.
+
+Uso:
+    python benchmarks/bench_startup.py [repeticiones]
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import model
+imported = time.perf_counter()
+loaded = model.get_model()
+ready = time.perf_counter()
+sys.path.insert(0, "benchmarks")
+from synthetic import make_pumps
+record = make_pumps(1)
+before = time.perf_counter()
+model.predict_pump_status(record)
+done = time.perf_counter()
+print(json.dumps({
+    "source": loaded.source,
+    "import": imported - start,
+    "load": ready - imported,
+    "first_prediction": done - before,
+    "total": (imported - start) + (ready - imported) + (done - before),
+}))
+"""
+
+
+def measure(native, repeat):
+    env = dict(os.environ, PUMP_NATIVE_MODEL="1" if native else "0")
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", PROBE], cwd=ROOT, env=env,
+            capture_output=True, text=True, check=True,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return runs
+
+
+def main(repeat=5):
+    for native in (False, True):
+        runs = measure(native, repeat)
+        stages = {key: np.median([run[key] for run in runs]) * 1e3 for key in ("import", "load", "first_prediction", "total")}
+        print(f"{runs[0]['source']:>7}: import {stages['import']:7.1f} ms  carga {stages['load']:7.1f} ms  "
+              f"primera predicción {stages['first_prediction']:6.1f} ms  total {stages['total']:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,70 @@
+"""
+Prueba de carga de `/predict` con tamaños de lote mezclados.
+
+Lanza clientes concurrentes que envían lotes pequeños y grandes contra una API
+en ejecución y reporta p50/p99 de latencia por tamaño de lote. Requiere `httpx`.
+
+Ejemplo:
+    PUMP_WORKERS=4 PUMP_NTHREAD=2 uvicorn api:app --port 8000
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --duration 30
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+import numpy as np
+
+from synthetic import make_pumps, to_records
+
+
+async def client_loop(client, url, payload, deadline, latencies):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.post(url, json=payload)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(args):
+    url = f"{args.url.rstrip('/')}/predict"
+    mix = {
+        "pequeño": (args.small_rows, args.small_clients),
+        "grande": (args.large_rows, args.large_clients),
+    }
+    latencies = {name: [] for name in mix}
+    deadline = time.perf_counter() + args.duration
+
+    async with httpx.AsyncClient(timeout=None) as client:
+        tasks = []
+        for name, (rows, clients) in mix.items():
+            payload = {"data": to_records(make_pumps(rows))}
+            tasks += [
+                client_loop(client, url, payload, deadline, latencies[name])
+                for _ in range(clients)
+            ]
+        await asyncio.gather(*tasks)
+
+    for name, (rows, clients) in mix.items():
+        values = np.asarray(latencies[name]) * 1e3
+        if len(values) == 0:
+            print(f"{name:>8} ({rows} filas, {clients} clientes): sin respuestas")
+            continue
+        p50, p99 = np.percentile(values, [50, 99])
+        print(f"{name:>8} ({rows} filas, {clients} clientes): {len(values)} solicitudes, "
+              f"p50 {p50:.1f} ms, p99 {p99:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--duration", type=float, default=20.0, help="segundos de prueba")
+    parser.add_argument("--small-rows", type=int, default=1)
+    parser.add_argument("--small-clients", type=int, default=16)
+    parser.add_argument("--large-rows", type=int, default=100_000)
+    parser.add_argument("--large-clients", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
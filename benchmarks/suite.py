@@ -0,0 +1,237 @@
+"""
+Suite de rendimiento de la predicción y del dashboard, con líneas base en JSON.
+
+Mide sobre datos sintéticos (`synthetic.py`):
+    - `preprocess_inputs` y `predict_pump_status` con varios tamaños de lote;
+    - `explain_contributions` (SHAP exacto y aproximado);
+    - `/predict` de punta a punta con el cliente de prueba de FastAPI;
+    - `filter_wells_for_plot`, `count_status_groups` y `wells_by_year`;
+    - cada callback de `Dash.py`, en frío (caché vacío) y en caliente;
+    - las consultas del índice espacial (radio, vecinos más cercanos y rectángulo).
+
+Uso:
+    python benchmarks/suite.py run --output benchmarks/baselines/local.json
+    python benchmarks/suite.py compare benchmarks/baselines/local.json --threshold 0.25
+
+`compare` vuelve a medir y termina con código 1 si algún caso tarda más que
+la línea base multiplicada por (1 + threshold).
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+# El dashboard no debe vigilar archivos ni persistir su caché durante las mediciones
+os.environ["PUMP_RELOAD_INTERVAL"] = "0"
+os.environ.pop("DASH_CACHE_PATH", None)
+
+import ModelDash  # noqa: E402
+import model  # noqa: E402
+from synthetic import make_pumps, make_wells, to_records  # noqa: E402
+
+PREDICT_SIZES = [1, 100, 10_000, 100_000]
+ENDPOINT_SIZES = [1, 100, 1_000]
+DASHBOARD_ROWS = 60_000
+
+
+def measure(func, repeat=7, number=1, setup=None):
+    """
+    Ejecuta `func` `number` veces por muestra, `repeat` muestras, y devuelve
+    mediana, mínimo y p90 en milisegundos por llamada.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+    times = np.asarray(times) * 1e3
+    return {
+        "median_ms": float(np.median(times)),
+        "min_ms": float(times.min()),
+        "p90_ms": float(np.percentile(times, 90)),
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def number_for(n_rows):
+    """Llamadas por muestra: más para los casos rápidos, para que el reloj no domine."""
+    return max(1, min(200, 2_000 // max(n_rows, 1)))
+
+
+def prediction_cases():
+    # Sin caché: se mide el costo de predecir, no el de acertar en el caché
+    model.prediction_cache.max_entries = 0
+    model.get_model()
+    for n_rows in PREDICT_SIZES:
+        df = make_pumps(n_rows, seed=n_rows)
+        repeat = 3 if n_rows >= 100_000 else 7
+        yield f"preprocess_inputs[{n_rows}]", lambda df=df: model.preprocess_inputs(df), \
+            dict(repeat=repeat, number=number_for(n_rows))
+        yield f"predict_pump_status[{n_rows}]", lambda df=df: model.predict_pump_status(df), \
+            dict(repeat=repeat, number=number_for(n_rows))
+
+    # Explicaciones sin caché: SHAP exacto (unos 10 ms por fila) y aproximado
+    model.explanation_cache.max_entries = 0
+    df = make_pumps(100, seed=100)
+    yield "explain_contributions[100]", lambda: model.explain_contributions(df), dict(repeat=3)
+    df = make_pumps(10_000, seed=10_000)
+    yield "explain_contributions[10000, aproximado]", \
+        lambda: model.explain_contributions(df, approximate=True), dict(repeat=3)
+
+
+def endpoint_cases():
+    from fastapi.testclient import TestClient
+
+    import api
+
+    with TestClient(api.app) as client:
+        for n_rows in ENDPOINT_SIZES:
+            payload = {"data": to_records(make_pumps(n_rows, seed=n_rows))}
+
+            def post(payload=payload):
+                response = client.post("/predict", json=payload)
+                response.raise_for_status()
+
+            yield f"POST /predict[{n_rows}]", post, dict(number=max(1, number_for(n_rows) // 10))
+
+
+def dashboard_cases(workdir):
+    wells_df = make_wells(DASHBOARD_ROWS)
+    data_dir = Path(workdir) / "data"
+    data_dir.mkdir()
+    wells_df.to_csv(data_dir / "pumps_cleaned.csv", index=False)
+    df = pd.read_csv(data_dir / "pumps_cleaned.csv")
+
+    yield "filter_wells_for_plot[sin filtros]", lambda: ModelDash.filter_wells_for_plot(df), {}
+    yield "filter_wells_for_plot[región+edad]", \
+        lambda: ModelDash.filter_wells_for_plot(df, region=df["region"].iloc[0], well_age=[10, 30]), {}
+    yield "count_status_groups", lambda: ModelDash.count_status_groups(df), {}
+    yield "wells_by_year", lambda: ModelDash.wells_by_year(df), {}
+
+    # Dash.py carga los datos de data/ relativo al directorio actual
+    previous = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import Dash
+    finally:
+        os.chdir(previous)
+
+    filters = ("", df["region"].iloc[0], [0, 70], "", "", "")
+    callbacks = {
+        "update_counts": lambda: Dash.update_counts(""),
+        "update_damaged_chart": lambda: Dash.update_damaged_chart(None),
+        "update_map": lambda: Dash.update_map(*filters, None),
+        "update_pie_chart": lambda: Dash.update_pie_chart(*filters),
+    }
+    for name, callback in callbacks.items():
+        yield f"Dash.{name}[frío]", callback, dict(setup=Dash.query_cache.clear)
+        yield f"Dash.{name}[caliente]", callback, dict(number=20)
+
+    spatial = Dash.data.get().spatial
+    yield "SpatialIndex.radius[10km]", lambda: spatial.radius(35.0, -6.0, 10), dict(number=100)
+    yield "SpatialIndex.nearest[10]", lambda: spatial.nearest(35.0, -6.0, 10), dict(number=100)
+    yield "SpatialIndex.bbox[1°]", lambda: spatial.bbox(34.0, -7.0, 35.0, -6.0), dict(number=100)
+    yield "SpatialIndex.bbox[país]", lambda: spatial.bbox(29.5, -11.5, 40.0, -1.0), dict(number=100)
+
+
+def environment():
+    import xgboost
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "xgboost": xgboost.__version__,
+        "model_version": model.get_model().version,
+        "backend": model.get_model().backend_name,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def run_suite(only=None):
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for cases in (prediction_cases(), endpoint_cases(), dashboard_cases(workdir)):
+            for name, func, options in cases:
+                if only and only not in name:
+                    continue
+                func()  # calentamiento
+                results[name] = measure(func, **options)
+                print(f"{name:<40} {results[name]['median_ms']:10.3f} ms", flush=True)
+    return {"environment": environment(), "results": results}
+
+
+def compare(baseline, current, threshold, min_ms):
+    """
+    Compara medianas y devuelve la lista de regresiones. Los casos que
+    cambian menos de `min_ms` en términos absolutos no se marcan (ruido).
+    """
+    regressions = []
+    print(f"\n{'caso':<40} {'base':>10} {'actual':>10} {'cambio':>8}")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<40} {'-':>10} {result['median_ms']:10.3f}     nuevo")
+            continue
+        change = result["median_ms"] / base["median_ms"] - 1
+        regressed = change > threshold and result["median_ms"] - base["median_ms"] > min_ms
+        flag = "  REGRESIÓN" if regressed else ""
+        print(f"{name:<40} {base['median_ms']:10.3f} {result['median_ms']:10.3f} {change:+8.1%}{flag}")
+        if regressed:
+            regressions.append(name)
+    changed = {key for key in current["environment"] if key != "date"
+               and current["environment"][key] != baseline["environment"].get(key)}
+    if changed:
+        print(f"\nEl entorno cambió respecto a la línea base: {sorted(changed)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="medir y guardar los resultados")
+    run_parser.add_argument("--output", help="archivo JSON de salida (línea base)")
+    compare_parser = subparsers.add_parser("compare", help="medir y comparar con una línea base")
+    compare_parser.add_argument("baseline", help="archivo JSON de la línea base")
+    compare_parser.add_argument("--threshold", type=float, default=0.25, help="aumento relativo tolerado")
+    compare_parser.add_argument("--min-ms", type=float, default=0.05, help="diferencia absoluta mínima para marcar")
+    compare_parser.add_argument("--output", help="guardar también los resultados actuales")
+    for subparser in (run_parser, compare_parser):
+        subparser.add_argument("--only", help="medir solo los casos cuyo nombre contenga este texto")
+    args = parser.parse_args()
+
+    current = run_suite(args.only)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+
+    if args.command == "compare":
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.threshold, args.min_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regresiones por encima de {args.threshold:.0%}")
+            return 1
+        print("\nSin regresiones")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+Generador de datos sintéticos con el esquema de `PumpRecord`.
+
+Las categorías se toman de las columnas del modelo, más el nivel que
+`drop_first` eliminó (que se codifica como todo ceros), para que todas las
+filas sean válidas para `/predict/columns`. `make_wells` agrega `status_group` para
+obtener el esquema de `data/pumps_cleaned.csv` que usa el dashboard.
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from model import CATEGORICAL_COLUMNS, STATUS_GROUPS, get_model  # noqa: E402
+
+
+def make_pumps(n_rows, seed=0):
+    """
+    Devuelve un DataFrame de `n_rows` bombas con los 16 campos de `PumpRecord`.
+    """
+    encoder = get_model().encoder
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"id": (np.arange(n_rows) + 1).astype(str)})
+    df["longitude"] = rng.uniform(29.5, 40.0, n_rows)
+    df["latitude"] = rng.uniform(-11.5, -1.0, n_rows)
+    for column in CATEGORICAL_COLUMNS:
+        levels = list(encoder.categories[column]) + [encoder.dropped_levels[column]]
+        df[column] = rng.choice(np.asarray(levels, dtype=object), n_rows)
+    df["population_imputed"] = rng.integers(0, 2000, n_rows)
+    df["altitud"] = rng.uniform(0, 2500, n_rows)
+    df["construction_year_imputed"] = rng.integers(1960, 2014, n_rows)
+    df["imputed_permit"] = rng.random(n_rows) < 0.6
+    order = ["id", "longitude", "latitude", "region", "extraction_type", "management", "payment_type",
+             "quality_group", "quantity_group", "source", "waterpoint_type", "population_imputed",
+             "altitud", "construction_year_imputed", "imputed_scheme__management", "imputed_permit"]
+    return df[order]
+
+
+def make_wells(n_rows, seed=0):
+    """
+    Devuelve un DataFrame con las columnas de `data/pumps_cleaned.csv`: los
+    campos de `PumpRecord` (con `id` numérico) y `status_group`.
+    """
+    rng = np.random.default_rng(seed + 1)
+    df = make_pumps(n_rows, seed)
+    df["id"] = rng.permutation(n_rows * 2)[:n_rows]
+    df["status_group"] = rng.choice(np.asarray(STATUS_GROUPS, dtype=object), n_rows, p=[0.54, 0.07, 0.39])
+    return df
+
+
+def to_records(df):
+    """Carga útil fila a fila, como la recibe `/predict`."""
+    return df.to_dict(orient="records")
+
+
+def to_columns(df):
+    """Carga útil columnar, como la recibe `/predict/columns`."""
+    return {column: df[column].tolist() for column in df.columns}
@@ -0,0 +1,85 @@
+import pandas as pd
+
+from model import STATUS_GROUPS
+from serialization import dumps
+
+# Tamaño de bloque por defecto para la lectura de archivos grandes
+DEFAULT_CHUNKSIZE = 10_000
+
+OUTPUT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def detect_format(filename):
+    """
+    Deduce el formato de entrada ('csv' o 'parquet') a partir del nombre del archivo.
+    """
+    name = (filename or "").lower()
+    if name.endswith((".parquet", ".pq")):
+        return "parquet"
+    return "csv"
+
+
+def iter_chunks(source, input_format="csv", chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Lee un CSV o Parquet por bloques de `chunksize` filas.
+
+    `source` puede ser una ruta o un objeto tipo archivo. La memoria usada queda
+    acotada por el tamaño del bloque y no por el del archivo. El `id` se lee
+    como texto, igual que en `PumpRecord`. Cerrar el generador cierra el lector.
+    """
+    if input_format == "parquet":
+        import pyarrow.parquet as pq
+
+        with pq.ParquetFile(source) as parquet_file:
+            for batch in parquet_file.iter_batches(batch_size=chunksize):
+                chunk = batch.to_pandas()
+                if "id" in chunk.columns:
+                    chunk["id"] = chunk["id"].astype(str)
+                yield chunk
+    else:
+        with pd.read_csv(source, chunksize=chunksize, dtype={"id": str}) as reader:
+            yield from reader
+
+
+def format_chunk(predictions, output="csv", header=True):
+    """
+    Serializa un bloque de predicciones en formato columnar a CSV o NDJSON.
+    """
+    if output == "ndjson":
+        lines = [
+            dumps({
+                "pump_id": pump_id,
+                "status_group": status_group,
+                "probabilities": dict(zip(STATUS_GROUPS, probs)),
+            })
+            for pump_id, status_group, probs in zip(
+                predictions["ids"], predictions["status_group"], predictions["probabilities"]
+            )
+        ]
+        return b"".join(line + b"\n" for line in lines).decode()
+
+    return predictions_frame(predictions).to_csv(index=False, header=header)
+
+
+def format_error(detail, output="csv"):
+    """
+    Registro de error para cortar una respuesta en streaming que ya empezó:
+    un objeto `{"error": ...}` en NDJSON o una línea de comentario en CSV.
+    """
+    if output == "ndjson":
+        return (dumps({"error": detail}) + b"\n").decode()
+    return f"# error: {detail}\n"
+
+
+def predictions_frame(predictions):
+    """
+    Convierte predicciones en formato columnar en un DataFrame con `pump_id`,
+    `status_group` y una columna de probabilidad por estado.
+    """
+    result_df = pd.DataFrame(predictions["probabilities"], columns=STATUS_GROUPS)
+    result_df.insert(0, "status_group", predictions["status_group"])
+    result_df.insert(0, "pump_id", predictions["ids"])
+    return result_df
@@ -0,0 +1,14 @@
+import argparse
+
+from ModelDash import DATA_ARROW_PATH, DATA_CSV_PATH, convert_dataset
+
+# Conversión del CSV limpio al formato columnar que carga el dashboard.
+# Debe repetirse cada vez que se actualice pumps_cleaned.csv.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convierte pumps_cleaned.csv a formato columnar (Feather).")
+    parser.add_argument("csv_path", nargs="?", default=DATA_CSV_PATH, help="ruta del CSV limpio")
+    parser.add_argument("--output", default=DATA_ARROW_PATH, help="ruta del archivo .arrow")
+    args = parser.parse_args()
+
+    info = convert_dataset(args.csv_path, args.output)
+    print(f"Datos convertidos ({info['rows']} filas, sha256 {info['source_sha256'][:12]}) -> {args.output}")
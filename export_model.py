@@ -0,0 +1,19 @@
+import argparse
+
+from model import export_native_model, load_model, model_path
+
+# Conversión única del pickle a formato nativo de XGBoost (UBJSON) + manifiesto.
+# Debe repetirse cada vez que se reemplace best_xgb_model.joblib.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta el modelo a formato nativo de XGBoost.")
+    parser.add_argument("path", nargs="?", default=model_path, help="ruta del pickle .joblib")
+    parser.add_argument("--treelite", action="store_true",
+                        help="compilar también la librería nativa para PUMP_BACKEND=treelite")
+    args = parser.parse_args()
+
+    manifest = export_native_model(args.path)
+    print(f"Modelo exportado ({len(manifest['feature_names'])} columnas, sha256 {manifest['source_sha256'][:12]})")
+
+    if args.treelite:
+        loaded = load_model(args.path, backend="treelite")
+        print(f"Librería compilada: {loaded.backend.libpath}")
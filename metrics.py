@@ -0,0 +1,253 @@
+import bisect
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Límites (segundos) de los histogramas de latencia
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Límites (filas) de los histogramas de tamaño de lote
+ROWS_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 1000000)
+
+# Perfilado opcional de solicitudes lentas (requiere `pyinstrument`): se perfila
+# una fracción PUMP_PROFILE_SAMPLE de las solicitudes y se guarda el reporte de
+# las que tarden más de PUMP_PROFILE_SLOW_MS.
+PROFILE_SAMPLE = float(os.environ.get("PUMP_PROFILE_SAMPLE", "0"))
+PROFILE_SLOW_MS = float(os.environ.get("PUMP_PROFILE_SLOW_MS", "500"))
+PROFILE_DIR = os.environ.get("PUMP_PROFILE_DIR", "profiles")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Contador acumulado, opcionalmente por etiquetas."""
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def lines(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram:
+    """Histograma con límites fijos; `observe` cuesta una búsqueda binaria."""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def lines(self):
+        with self._lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        lines = []
+        for key, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, key, [("le", _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class CallbackMetric:
+    """
+    Métrica cuyo valor se lee al exportar: `callback()` devuelve una lista de
+    (valores de etiquetas, valor). Sirve para exponer contadores que ya
+    existen en otros objetos (caché, agrupador) sin duplicarlos.
+    """
+
+    def __init__(self, name, documentation, type, callback, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.type = type
+        self.callback = callback
+        self.labels = tuple(labels)
+
+    def lines(self):
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in self.callback()
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Texto en el formato de exposición de Prometheus (versión 0.0.4)."""
+        output = []
+        for metric in self.metrics:
+            try:
+                lines = metric.lines()
+            except Exception:
+                logger.exception("No se pudo leer la métrica %s", metric.name)
+                continue
+            output.append(f"# HELP {metric.name} {metric.documentation}")
+            output.append(f"# TYPE {metric.name} {metric.type}")
+            output.extend(lines)
+        return "\n".join(output) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "pump_stage_seconds", "Duración de cada etapa de la predicción", labels=("stage",)
+))
+REQUEST_SECONDS = registry.register(Histogram(
+    "pump_request_seconds", "Duración total de las solicitudes HTTP", labels=("endpoint", "status")
+))
+BATCH_ROWS = registry.register(Histogram(
+    "pump_batch_rows", "Filas por solicitud de predicción", labels=("endpoint",), buckets=ROWS_BUCKETS
+))
+ROWS_TOTAL = registry.register(Counter(
+    "pump_rows_total", "Filas predichas", labels=("endpoint",)
+))
+ERRORS_TOTAL = registry.register(Counter(
+    "pump_errors_total", "Errores por endpoint y tipo de excepción", labels=("endpoint", "type")
+))
+PROFILES_TOTAL = registry.register(Counter(
+    "pump_profiles_written_total", "Perfiles guardados de solicitudes lentas"
+))
+
+
+@contextmanager
+def stage(name):
+    """Mide la duración del bloque en `pump_stage_seconds{stage=name}`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, name)
+
+
+def observe_stage(name, seconds):
+    STAGE_SECONDS.observe(seconds, name)
+
+
+def record_error(endpoint, error_type):
+    ERRORS_TOTAL.inc(endpoint, error_type)
+
+
+def endpoint_of(scope):
+    """Ruta declarada que atendió la solicitud ('other' si ninguna), para no crear una serie por URL."""
+    return getattr(scope.get("route"), "path", "other")
+
+
+def record_batch(endpoint, n_rows):
+    BATCH_ROWS.observe(n_rows, endpoint)
+    ROWS_TOTAL.inc(endpoint, amount=n_rows)
+
+
+def _load_profiler():
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        logger.warning("PUMP_PROFILE_SAMPLE está activo pero pyinstrument no está instalado")
+        return None
+    return Profiler
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mide la duración de cada solicitud por ruta y código
+    de respuesta y, si está configurado, perfila una muestra de solicitudes
+    guardando el reporte de las lentas en `PROFILE_DIR`.
+    """
+
+    def __init__(self, app, sample=PROFILE_SAMPLE, slow_ms=PROFILE_SLOW_MS, profile_dir=PROFILE_DIR):
+        self.app = app
+        self.sample = sample
+        self.slow = slow_ms / 1000
+        self.profile_dir = profile_dir
+        self.profiler_class = _load_profiler() if sample > 0 else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        profiler = None
+        if self.profiler_class is not None and random.random() < self.sample:
+            profiler = self.profiler_class(async_mode="enabled")
+            profiler.start()
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            endpoint = endpoint_of(scope)
+            REQUEST_SECONDS.observe(elapsed, endpoint, str(status["code"]))
+            if profiler is not None:
+                profiler.stop()
+                if elapsed >= self.slow:
+                    self._save_profile(profiler, endpoint, elapsed)
+
+    def _save_profile(self, profiler, endpoint, elapsed):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        name = re.sub(r"[^A-Za-z0-9]+", "_", endpoint).strip("_") or "root"
+        path = os.path.join(self.profile_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{elapsed * 1000:.0f}ms.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(profiler.output_text())
+        PROFILES_TOTAL.inc()
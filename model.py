@@ -1,46 +1,732 @@
-import joblib
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
 import pandas as pd
 
-# Cargar el modelo entrenado
-model_path = "model/best_xgb_model.joblib"
-model = joblib.load(model_path)
+from metrics import stage
+from reloading import VersionedState
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model")
+
+# Modelo entrenado (pickle de XGBClassifier) y su versión en formato nativo de XGBoost
+model_path = os.environ.get("PUMP_MODEL_PATH", os.path.join(MODEL_DIR, "best_xgb_model.joblib"))
+native_model_path = os.path.splitext(model_path)[0] + ".ubj"
+manifest_path = os.path.splitext(model_path)[0] + ".manifest.json"
+
+# PUMP_NATIVE_MODEL=0 obliga a cargar el pickle aunque exista la versión nativa
+USE_NATIVE_MODEL = os.environ.get("PUMP_NATIVE_MODEL", "1") != "0"
+
+
+def file_hash(path):
+    """
+    Devuelve el SHA-256 del archivo en `path`.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
 
 # Estados posibles
 STATUS_GROUPS = ["functional", "functional needs repair", "non functional"]
+STATUS_ARRAY = np.array(STATUS_GROUPS, dtype=object)
+
+# Columnas categóricas de `PumpRecord` que el modelo recibe como dummies
+CATEGORICAL_COLUMNS = [
+    "region",
+    "extraction_type",
+    "management",
+    "payment_type",
+    "quality_group",
+    "quantity_group",
+    "source",
+    "waterpoint_type",
+    "imputed_scheme__management",
+]
+
+# Nivel que `pd.get_dummies(drop_first=True)` eliminó de cada variable al
+# entrenar (el primero en orden alfabético de los datos de entrenamiento). No
+# tiene columna en el modelo, así que no se puede deducir de `feature_names`.
+DROPPED_LEVELS = {
+    "region": "Arusha",
+    "extraction_type": "afridev",
+    "management": "company",
+    "payment_type": "annually",
+    "quality_group": "colored",
+    "quantity_group": "dry",
+    "source": "dam",
+    "waterpoint_type": "cattle trough",
+    "imputed_scheme__management": "Company",
+}
+
+# Por debajo de este número de filas las categorías se traducen con un diccionario
+# en Python, que evita el costo fijo de `pd.factorize`
+SMALL_BATCH_ROWS = 32
+
+
+class FeatureEncoder:
+    """
+    Codificador precompilado a partir de los nombres de columnas del booster.
+
+    Reproduce `pd.get_dummies(drop_first=True)` seguido de la reindexación a las
+    columnas del modelo, pero escribiendo directamente sobre una matriz float32
+    en el orden de `feature_names`. El nivel que `drop_first` eliminó durante el
+    entrenamiento no tiene columna y se codifica como todo ceros.
+    """
+
+    def __init__(self, feature_names, categorical_columns=CATEGORICAL_COLUMNS, dropped_levels=None):
+        self.feature_names = list(feature_names)
+        self.n_features = len(self.feature_names)
+        self.dropped_levels = dict(DROPPED_LEVELS if dropped_levels is None else dropped_levels)
+
+        # Nivel -> índice de columna para cada variable categórica
+        self.categories = {}
+        self.category_indices = {}
+        self.level_codes = {}
+        assigned = set()
+        for column in categorical_columns:
+            prefix = f"{column}_"
+            levels, indices = [], []
+            for idx, name in enumerate(self.feature_names):
+                if name.startswith(prefix):
+                    levels.append(name[len(prefix):])
+                    indices.append(idx)
+            self.categories[column] = pd.Index(levels)
+            self.category_indices[column] = np.asarray(indices, dtype=np.intp)
+            self.level_codes[column] = {level: code for code, level in enumerate(levels)}
+            assigned.update(indices)
+
+        # Columnas que el modelo recibe tal cual (numéricas)
+        self.numeric_columns = {
+            name: idx for idx, name in enumerate(self.feature_names) if idx not in assigned
+        }
+
+        # Campo de entrada de cada columna (las dummies vuelven a su variable) y la
+        # matriz que suma las contribuciones por campo; la última fila y la última
+        # columna corresponden al sesgo de `pred_contribs`
+        self.fields = list(self.numeric_columns) + [
+            column for column in categorical_columns if len(self.category_indices[column])
+        ]
+        field_of_column = np.empty(self.n_features, dtype=np.intp)
+        for position, field in enumerate(self.fields):
+            if field in self.numeric_columns:
+                field_of_column[self.numeric_columns[field]] = position
+            else:
+                field_of_column[self.category_indices[field]] = position
+        self.field_fold = np.zeros((self.n_features + 1, len(self.fields) + 1), dtype=np.float32)
+        self.field_fold[np.arange(self.n_features), field_of_column] = 1.0
+        self.field_fold[-1, -1] = 1.0
+
+    def unknown_levels(self, column, values):
+        """
+        Devuelve los valores distintos de `values` que el modelo no reconoce.
+
+        Se aceptan los niveles con columna en `feature_names` y el nivel que
+        `drop_first` eliminó al entrenar (`dropped_levels`), que se codifica
+        como todo ceros.
+        """
+        levels = self.categories[column]
+        if len(levels) == 0:
+            return []
+        unknown = set(values).difference(levels)
+        unknown.discard(self.dropped_levels.get(column))
+        return sorted(unknown, key=str)
+
+    def transform(self, input_df):
+        """
+        Devuelve una matriz float32 (n_filas, n_features) lista para el modelo.
+        """
+        n_rows = len(input_df)
+        matrix = np.zeros((n_rows, self.n_features), dtype=np.float32)
+
+        # Igual que `get_dummies`, las columnas no numéricas (p. ej. `id` como texto)
+        # no pasan como valor y su columna en el modelo queda en cero
+        for name, idx in self.numeric_columns.items():
+            if name not in input_df.columns:
+                continue
+            values = input_df[name]
+            if values.dtype.kind in "biuf":
+                matrix[:, idx] = values.to_numpy(dtype=np.float32, na_value=np.nan)
+
+        # Escritura de los unos sobre la vista plana de la matriz (un solo `put` por variable)
+        flat = matrix.reshape(-1)
+        row_offsets = np.arange(n_rows, dtype=np.intp) * self.n_features
+        for column, levels in self.categories.items():
+            if column not in input_df.columns or len(levels) == 0:
+                continue
+            level_codes = self.level_codes[column]
+            values = input_df[column]
+            if n_rows <= SMALL_BATCH_ROWS:
+                codes = np.array([level_codes.get(value, -1) for value in values.tolist()], dtype=np.intp)
+            else:
+                # Se factoriza primero para traducir solo los valores distintos del lote
+                row_codes, uniques = pd.factorize(values)
+                lookup = np.array([level_codes.get(value, -1) for value in uniques] + [-1], dtype=np.intp)
+                codes = lookup[row_codes]
+            known = codes >= 0
+            flat[row_offsets[known] + self.category_indices[column][codes[known]]] = 1.0
+
+        return matrix
+
+
+class SklearnBackend:
+    """
+    `XGBClassifier.predict_proba`, el camino original (requiere el pickle y scikit-learn).
+    """
+
+    name = "sklearn"
+
+    def __init__(self, loaded):
+        self.wrapper = loaded.wrapper or load_joblib_model(loaded.path).wrapper
+
+    def predict_proba(self, matrix):
+        return self.wrapper.predict_proba(matrix)
+
+    def set_nthread(self, nthread):
+        self.wrapper.n_jobs = nthread
+        self.wrapper.get_booster().set_param({"nthread": nthread})
+
+
+class BoosterBackend:
+    """
+    `Booster.inplace_predict` sobre la matriz float32 contigua, sin DMatrix ni validaciones de sklearn.
+    """
+
+    name = "booster"
+
+    def __init__(self, loaded):
+        self.booster = loaded.booster
+
+    def predict_proba(self, matrix):
+        return self.booster.inplace_predict(np.ascontiguousarray(matrix, dtype=np.float32))
+
+    def set_nthread(self, nthread):
+        self.booster.set_param({"nthread": nthread})
+
+
+class TreeliteBackend:
+    """
+    Ensamble de árboles compilado a código nativo con treelite + tl2cgen.
+
+    La librería compilada se guarda junto al modelo, identificada por su versión,
+    y solo se compila la primera vez.
+    """
+
+    name = "treelite"
+
+    def __init__(self, loaded):
+        import tl2cgen
+        import treelite
+
+        self._tl2cgen = tl2cgen
+        self.libpath = f"{os.path.splitext(loaded.path)[0]}.{loaded.version[:12]}.so"
+        if not os.path.exists(self.libpath):
+            tree_model = treelite.frontend.from_xgboost(loaded.booster)
+            tl2cgen.export_lib(
+                tree_model, toolchain="gcc", libpath=self.libpath,
+                params={"parallel_comp": os.cpu_count() or 1},
+            )
+        self.predictor = tl2cgen.Predictor(self.libpath)
+
+    def predict_proba(self, matrix):
+        dmat = self._tl2cgen.DMatrix(np.ascontiguousarray(matrix, dtype=np.float32), dtype="float32")
+        return self.predictor.predict(dmat).reshape(len(matrix), -1)
+
+    def set_nthread(self, nthread):
+        self.predictor = self._tl2cgen.Predictor(self.libpath, nthread=nthread)
+
+
+# Motores de inferencia disponibles; se elige con PUMP_BACKEND
+BACKENDS = {
+    "sklearn": SklearnBackend,
+    "booster": BoosterBackend,
+    "treelite": TreeliteBackend,
+}
+BACKEND = os.environ.get("PUMP_BACKEND", "booster")
+
+
+class LoadedModel:
+    """
+    Modelo cargado junto con su codificador, su versión (hash del pickle de
+    origen) y el motor de inferencia.
+
+    `predict_proba` recibe la matriz float32 de `FeatureEncoder.transform`.
+    """
+
+    def __init__(self, booster, version, source, path=model_path, wrapper=None, backend=None, dropped_levels=None):
+        self.booster = booster
+        self.version = version
+        self.source = source
+        self.path = path
+        self.wrapper = wrapper
+        self.feature_names = list(booster.feature_names)
+        # Codificador construido una sola vez a partir del booster
+        self.encoder = FeatureEncoder(self.feature_names, dropped_levels=dropped_levels)
+        self.set_backend(backend or BACKEND)
+
+    def set_backend(self, name):
+        if name not in BACKENDS:
+            raise ValueError(f"Motor de inferencia desconocido: {name}. Opciones: {sorted(BACKENDS)}")
+        self.backend = BACKENDS[name](self)
+        self.backend_name = name
+
+    def predict_proba(self, matrix):
+        return self.backend.predict_proba(matrix)
+
+    def set_nthread(self, nthread):
+        self.backend.set_nthread(nthread)
+
+    def field_contributions(self, matrix, approximate=False):
+        """
+        Contribuciones SHAP nativas de XGBoost (`pred_contribs`) sumadas por
+        campo de entrada: (n_filas, n_estados, n_campos + 1) en escala de margen,
+        con el valor base en la última posición. Siempre usa el booster, sea
+        cual sea el motor de inferencia.
+        """
+        import xgboost as xgb
+
+        contributions = self.booster.predict(
+            xgb.DMatrix(np.ascontiguousarray(matrix, dtype=np.float32)),
+            pred_contribs=True, approx_contribs=approximate, validate_features=False,
+        )
+        return contributions.reshape(len(matrix), -1, self.encoder.n_features + 1) @ self.encoder.field_fold
+
+
+def read_manifest(path=manifest_path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_joblib_model(path=model_path, backend=None):
+    """
+    Carga el pickle de `XGBClassifier` (requiere scikit-learn).
+    """
+    import joblib
+
+    wrapper = joblib.load(path)
+    return LoadedModel(wrapper.get_booster(), file_hash(path), "joblib", path=path, wrapper=wrapper, backend=backend)
+
+
+def load_native_model(path=native_model_path, manifest=None, source_path=model_path, backend=None):
+    """
+    Carga el booster en formato nativo de XGBoost, sin deserializar el envoltorio de sklearn.
+    """
+    import xgboost as xgb
+
+    manifest = manifest or read_manifest()
+    booster = xgb.Booster()
+    booster.load_model(path)
+    if list(booster.feature_names) != manifest["feature_names"]:
+        raise ValueError(f"Las columnas de {path} no coinciden con su manifiesto")
+    return LoadedModel(booster, manifest["source_sha256"], "native", path=source_path, backend=backend,
+                       dropped_levels=manifest.get("dropped_levels"))
+
+
+def load_model(path=model_path, backend=None):
+    """
+    Carga el modelo, prefiriendo la versión nativa si su manifiesto coincide con
+    el pickle. El motor `sklearn` siempre carga el pickle.
+    """
+    backend = backend or BACKEND
+    manifest = read_manifest(os.path.splitext(path)[0] + ".manifest.json")
+    native_path = os.path.splitext(path)[0] + ".ubj"
+    if backend != "sklearn" and USE_NATIVE_MODEL and manifest is not None and os.path.exists(native_path):
+        source_matches = not os.path.exists(path) or file_hash(path) == manifest["source_sha256"]
+        if source_matches and file_hash(native_path) == manifest["model_sha256"]:
+            return load_native_model(native_path, manifest, source_path=path, backend=backend)
+    return load_joblib_model(path, backend=backend)
+
+
+def export_native_model(path=model_path):
+    """
+    Convierte el pickle en el formato nativo UBJSON de XGBoost y escribe el
+    manifiesto con los nombres de columnas, el orden de clases, los niveles
+    eliminados por `drop_first` y los hashes.
+    """
+    import xgboost as xgb
+
+    loaded = load_joblib_model(path, backend="booster")
+    native_path = os.path.splitext(path)[0] + ".ubj"
+    loaded.booster.save_model(native_path)
+    manifest = {
+        "feature_names": loaded.feature_names,
+        "classes": STATUS_GROUPS,
+        "dropped_levels": loaded.encoder.dropped_levels,
+        "objective": loaded.wrapper.objective,
+        "source_sha256": loaded.version,
+        "model_sha256": file_hash(native_path),
+        "xgboost_version": xgb.__version__,
+    }
+    with open(os.path.splitext(path)[0] + ".manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+
+def validate_model(candidate, current=None):
+    """
+    Verifica que un modelo recargado pueda reemplazar al activo: mismas columnas
+    (el codificador y la validación de la API dependen de ellas) y una
+    predicción de prueba con la forma y los valores esperados.
+    """
+    if current is not None and candidate.feature_names != current.feature_names:
+        raise ValueError("Las columnas del modelo nuevo no coinciden con las del modelo activo")
+    probabilities = np.asarray(candidate.predict_proba(np.zeros((1, len(candidate.feature_names)), dtype=np.float32)))
+    if probabilities.shape != (1, len(STATUS_GROUPS)) or not np.isfinite(probabilities).all():
+        raise ValueError(f"El modelo nuevo devuelve probabilidades con forma {probabilities.shape}")
+
+
+# Modelo activo. Se carga en la primera llamada a `get_model` y se reemplaza en
+# caliente cuando cambian el pickle, la versión nativa o su manifiesto.
+model_state = VersionedState(
+    "modelo",
+    [model_path, native_model_path, manifest_path],
+    load=load_model,
+    version=lambda loaded: loaded.version,
+    validate=validate_model,
+)
+
+
+def get_model():
+    """
+    Devuelve el modelo cargado; la carga ocurre en la primera llamada.
+    """
+    return model_state.get()
+
+# Campos de `PumpRecord` que definen una bomba para el caché (todos menos `id`)
+FEATURE_FIELDS = [
+    "longitude",
+    "latitude",
+    "region",
+    "extraction_type",
+    "management",
+    "payment_type",
+    "quality_group",
+    "quantity_group",
+    "source",
+    "waterpoint_type",
+    "population_imputed",
+    "altitud",
+    "construction_year_imputed",
+    "imputed_scheme__management",
+    "imputed_permit",
+]
+
+# Multiplicador impar de 64 bits para combinar los hashes por campo
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+
+def feature_hashes(input_df, seed=0):
+    """
+    Devuelve un hash estable de 64 bits por fila a partir de `FEATURE_FIELDS`
+    (y de `seed`, que permite separar las claves de distintas versiones del modelo).
+
+    Los valores se normalizan antes de calcular el hash (números a float32, como
+    los recibe el modelo, y el resto a texto), de modo que 3 y 3.0 dan la misma clave. El `id` solo se
+    incluye si es numérico, porque solo entonces llega al modelo.
+    `pd.util.hash_array` usa una clave fija, así que el hash es el mismo entre
+    procesos y ejecuciones.
+    """
+    fields = list(FEATURE_FIELDS)
+    if "id" in input_df.columns and input_df["id"].dtype.kind in "biuf":
+        fields.append("id")
+
+    hashes = np.full(len(input_df), seed, dtype=np.uint64)
+    for field in fields:
+        if field not in input_df.columns:
+            continue
+        values = input_df[field]
+        if values.dtype.kind in "biuf":
+            # Se usa float32, la precisión que recibe el modelo: un valor leído de CSV
+            # y el mismo guardado en Parquet dan la misma clave. `+ 0.0` unifica -0.0 y 0.0
+            field_hash = pd.util.hash_array(values.to_numpy(dtype=np.float32, na_value=np.nan) + np.float32(0.0))
+        else:
+            field_hash = pd.util.hash_array(
+                values.to_numpy(dtype=object).astype(str).astype(object), categorize=len(values) > SMALL_BATCH_ROWS
+            )
+        # Combinación no conmutativa para que el orden de los campos importe
+        hashes = hashes * np.uint64(HASH_MULTIPLIER) ^ field_hash
+    return hashes
+
+
+class PredictionCache:
+    """
+    Caché LRU con expiración (TTL) de probabilidades por hash de bomba.
+
+    El tamaño queda acotado por `max_entries` y, si se indica, por `max_bytes`
+    (estimado con `ENTRY_BYTES` por entrada). Se vacía al cambiar la versión
+    del modelo.
+    """
+
+    # Estimación del costo en memoria de una entrada (clave, lista de 3 floats y nodo del OrderedDict)
+    ENTRY_BYTES = 256
+
+    def __init__(self, max_entries, ttl=None, max_bytes=None):
+        if max_bytes:
+            max_entries = min(max_entries, max_bytes // self.ENTRY_BYTES)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check_version(self, version):
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+
+    def lookup(self, keys, width=len(STATUS_GROUPS)):
+        """
+        Devuelve la matriz de probabilidades (NaN en los fallos) y la máscara de fallos.
+        `width` es el número de valores por entrada.
+        """
+        probabilities = np.full((len(keys), width), np.nan)
+        missing = np.ones(len(keys), dtype=bool)
+        now = time.monotonic()
+        with self._lock:
+            for row, key in enumerate(keys.tolist()):
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                probs, expires = entry
+                if expires is not None and expires < now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                probabilities[row] = probs
+                missing[row] = False
+            n_hits = len(keys) - int(missing.sum())
+            self.hits += n_hits
+            self.misses += len(keys) - n_hits
+        return probabilities, missing
+
+    def store(self, keys, probabilities):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            for key, probs in zip(keys.tolist(), np.asarray(probabilities).tolist()):
+                self._entries[key] = (probs, expires)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "model_version": self.version,
+        }
+
+
+# PUMP_CACHE_SIZE=0 desactiva el caché; PUMP_CACHE_TTL en segundos (0 = sin expiración)
+prediction_cache = PredictionCache(
+    max_entries=int(os.environ.get("PUMP_CACHE_SIZE", "100000")),
+    ttl=float(os.environ.get("PUMP_CACHE_TTL", "86400")) or None,
+    max_bytes=int(os.environ.get("PUMP_CACHE_MAX_BYTES", "0")) or None,
+)
+# Contribuciones por campo de `explain_contributions`; cada entrada ocupa unas 20
+# veces lo que una predicción. PUMP_EXPLAIN_CACHE_SIZE=0 desactiva el caché.
+explanation_cache = PredictionCache(
+    max_entries=int(os.environ.get("PUMP_EXPLAIN_CACHE_SIZE", "20000")),
+    ttl=float(os.environ.get("PUMP_CACHE_TTL", "86400")) or None,
+)
+# Al activar un modelo (el inicial o uno recargado) se descartan las predicciones del anterior
+model_state.add_listener(lambda loaded, old: prediction_cache.check_version(loaded.version))
+model_state.add_listener(lambda loaded, old: explanation_cache.check_version(loaded.version))
+
 
 def preprocess_inputs(input_df):
     """
     Preprocesa los datos para asegurar que coincidan con las columnas esperadas por el modelo.
     """
-    model_features = model.get_booster().feature_names
+    return get_model().encoder.transform(input_df)
 
-    # Convertir `imputed_permit` a numérico
-    if "imputed_permit" in input_df.columns:
-        input_df["imputed_permit"] = input_df["imputed_permit"].map({True: 1, False: 0}).astype(int)
+def predict_pump_status(input_df, columnar=False):
+    """
+    Predice el estado de las bombas usando el modelo entrenado.
 
-    # Convertir variables categóricas a dummies
-    input_df = pd.get_dummies(input_df, drop_first=True)
+    Con `columnar=True` devuelve un diccionario con las listas `ids`,
+    `status_group` y `probabilities` (una fila de 3 valores por bomba) en lugar
+    de un diccionario por bomba.
+    """
+    probabilities = predict_probabilities(input_df)
+    return build_predictions(input_df["id"], probabilities, columnar=columnar)
 
-    # Asegurar que las columnas del modelo estén presentes
-    for col in model_features:
-        if col not in input_df.columns:
-            input_df[col] = 0
 
-    return input_df[model_features]
+def predict_probabilities(input_df):
+    """
+    Devuelve la matriz de probabilidades (n_filas, 3) en el orden de `STATUS_GROUPS`.
 
-def predict_pump_status(input_df):
+    Solo se predicen las bombas que no están en `prediction_cache`.
     """
-    Predice el estado de las bombas usando el modelo entrenado.
+    loaded = get_model()
+    if prediction_cache.max_entries <= 0:
+        return score_frame(loaded, input_df)
+
+    with stage("cache"):
+        # La versión entra en la clave: una predicción en curso con el modelo anterior
+        # nunca se mezcla con las del modelo nuevo
+        keys = feature_hashes(input_df, seed=int(loaded.version[:16], 16))
+        probabilities, missing = prediction_cache.lookup(keys)
+    if missing.any():
+        scored = score_frame(loaded, input_df[missing])
+        probabilities[missing] = scored
+        prediction_cache.store(keys[missing], scored)
+    return probabilities
+
+
+def score_frame(loaded, input_df):
+    with stage("preprocess"):
+        matrix = loaded.encoder.transform(input_df)
+    with stage("predict"):
+        return loaded.predict_proba(matrix)
+
+
+def explain_contributions(input_df, approximate=False):
+    """
+    Devuelve las contribuciones por campo (n_filas, n_estados, n_campos + 1)
+    en escala de margen, con el valor base en la última posición; los campos
+    son `get_model().encoder.fields`.
+
+    Solo se explican las bombas que no están en `explanation_cache`, y las
+    repetidas dentro del lote una sola vez. `approximate=True` usa las
+    contribuciones aproximadas de XGBoost (Saabas), mucho más rápidas que SHAP.
+    """
+    loaded = get_model()
+    shape = (len(STATUS_GROUPS), len(loaded.encoder.fields) + 1)
+    width = shape[0] * shape[1]
+    use_cache = explanation_cache.max_entries > 0
+
+    with stage("cache"):
+        keys = feature_hashes(input_df, seed=int(loaded.version[:16], 16) ^ int(approximate))
+        if use_cache:
+            contributions, missing = explanation_cache.lookup(keys, width)
+        else:
+            contributions, missing = np.empty((len(input_df), width)), np.ones(len(input_df), dtype=bool)
+    if missing.any():
+        unique_keys, first, inverse = np.unique(keys[missing], return_index=True, return_inverse=True)
+        with stage("preprocess"):
+            matrix = loaded.encoder.transform(input_df[missing].iloc[first])
+        with stage("explain"):
+            computed = loaded.field_contributions(matrix, approximate).reshape(len(first), width)
+        contributions[missing] = computed[inverse.reshape(-1)]
+        if use_cache:
+            explanation_cache.store(unique_keys, computed)
+    return contributions.reshape(len(input_df), *shape)
+
+
+def set_nthread(nthread):
     """
-    processed_df = preprocess_inputs(input_df)
-    probabilities = model.predict_proba(processed_df)
+    Fija el número de hilos que usa XGBoost para predecir.
+    """
+    get_model().set_nthread(nthread)
+
+
+def build_predictions(ids, probabilities, columnar=False):
+    """
+    Construye la respuesta a partir de los ids y la matriz de probabilidades.
+    """
+    # Convertir a string y a float nativo para evitar problemas al serializar
+    pump_ids = pd.Series(ids).astype(str).tolist()
+    status_groups = STATUS_ARRAY[probabilities.argmax(axis=1)].tolist()
+    probability_rows = probabilities.astype(float).tolist()
+
+    if columnar:
+        return {
+            "ids": pump_ids,
+            "status_group": status_groups,
+            "probabilities": probability_rows,
+        }
+
+    return [
+        {
+            "pump_id": pump_id,
+            "status_group": status_group,
+            "probabilities": dict(zip(STATUS_GROUPS, probs)),
+        }
+        for pump_id, status_group, probs in zip(pump_ids, status_groups, probability_rows)
+    ]
+
+
+def build_explanations(input_df, contributions, fields, k=5, status=None):
+    """
+    Construye la respuesta de `/explain`: por bomba, el estado predicho, las
+    probabilidades y los `k` campos con mayor contribución (en valor absoluto)
+    al estado explicado, que es el predicho salvo que se indique `status`.
+
+    La selección de los `k` campos se hace para todo el lote con operaciones
+    sobre arreglos; solo el armado de los diccionarios recorre las filas.
+    """
+    n_rows, n_fields = len(input_df), len(fields)
+    margins = contributions.sum(axis=2)
+    probabilities = np.exp(margins - margins.max(axis=1, keepdims=True))
+    probabilities /= probabilities.sum(axis=1, keepdims=True)
+    predicted = probabilities.argmax(axis=1)
+    explained = predicted if status is None else np.full(n_rows, STATUS_GROUPS.index(status))
+
+    rows = np.arange(n_rows)
+    by_field = contributions[rows, explained, :-1]
+    base_values = contributions[rows, explained, -1]
+
+    # Las columnas del modelo que no reciben un valor de la entrada (campos
+    # ausentes, como `gdp_per_capita`, o un `id` no numérico) valen siempre cero:
+    # su contribución se suma al valor base y no se informan como campos
+    received = np.array([
+        field in input_df.columns and (field in CATEGORICAL_COLUMNS or input_df[field].dtype.kind in "biuf")
+        for field in fields
+    ], dtype=bool)
+    base_values = base_values + by_field[:, ~received].sum(axis=1)
+    by_field = by_field[:, received]
+    fields = [field for field, keep in zip(fields, received) if keep]
+    n_fields = len(fields)
+    k = min(k, n_fields)
+    magnitude = np.abs(by_field)
+    top = np.argpartition(-magnitude, k - 1, axis=1)[:, :k]
+    top = np.take_along_axis(top, np.argsort(-np.take_along_axis(magnitude, top, axis=1), axis=1), axis=1)
+
+    # Valores de entrada de cada campo informado
+    values = np.empty((n_rows, n_fields), dtype=object)
+    for position, field in enumerate(fields):
+        values[:, position] = input_df[field].to_numpy(dtype=object)
 
-    predictions = [
+    top_fields = np.asarray(fields, dtype=object)[top].tolist()
+    top_values = np.take_along_axis(values, top, axis=1).tolist()
+    top_contributions = np.take_along_axis(by_field, top, axis=1).astype(float).tolist()
+    return [
         {
-            "pump_id": str(input_df.iloc[idx]["id"]),  # Convertir a string para evitar problemas
-            "status_group": STATUS_GROUPS[probs.argmax()],
-            "probabilities": {STATUS_GROUPS[i]: float(prob) for i, prob in enumerate(probs)}  # Convertir a float nativo
+            "pump_id": pump_id,
+            "status_group": STATUS_GROUPS[predicted_code],
+            "probabilities": dict(zip(STATUS_GROUPS, probs)),
+            "explained_status": STATUS_GROUPS[explained_code],
+            "base_value": base_value,
+            "contributions": [
+                {"field": field, "value": value, "contribution": contribution}
+                for field, value, contribution in zip(row_fields, row_values, row_contributions)
+            ],
         }
-        for idx, probs in enumerate(probabilities)
+        for pump_id, predicted_code, probs, explained_code, base_value, row_fields, row_values, row_contributions
+        in zip(
+            input_df["id"].astype(str).tolist(), predicted.tolist(), probabilities.astype(float).tolist(),
+            explained.tolist(), base_values.astype(float).tolist(), top_fields, top_values, top_contributions,
+        )
     ]
-    return predictions
@@ -0,0 +1,146 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Segundos entre revisiones de los archivos vigilados (0 desactiva la recarga en caliente)
+RELOAD_INTERVAL = float(os.environ.get("PUMP_RELOAD_INTERVAL", "10"))
+
+
+def file_signature(paths):
+    """
+    Firma barata de un conjunto de archivos: (ruta, mtime, tamaño) de los que existen.
+    """
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+class VersionedState:
+    """
+    Valor versionado (modelo, datos) que se recarga cuando cambian sus archivos.
+
+    `load()` construye un valor nuevo, `version(valor)` devuelve su versión y
+    `validate(nuevo, actual)` lanza una excepción si el nuevo no es utilizable.
+    La carga y la validación ocurren fuera del lock; el reemplazo es una sola
+    asignación, así que quien ya obtuvo el valor con `get` termina con la
+    versión anterior. Tras cada reemplazo (y tras la carga inicial) se llama a
+    los `listeners` con (nuevo, anterior) para invalidar cachés e índices.
+    """
+
+    def __init__(self, name, paths, load, version, validate=None, interval=RELOAD_INTERVAL):
+        self.name = name
+        self.paths = list(paths)
+        self.load = load
+        self.version_of = version
+        self.validate = validate
+        self.interval = interval
+        self.listeners = []
+
+        self.value = None
+        self.version = None
+        self.signature = None
+        self.loaded_at = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def get(self):
+        """Devuelve el valor activo; la primera llamada lo carga."""
+        if self.value is None:
+            with self._load_lock:
+                if self.value is None:
+                    signature = file_signature(self.paths)
+                    self._swap(self.load(), signature)
+        return self.value
+
+    def _swap(self, value, signature):
+        old = self.value
+        self.value = value
+        self.version = self.version_of(value)
+        self.signature = signature
+        self.loaded_at = time.time()
+        for listener in self.listeners:
+            listener(value, old)
+
+    def check(self):
+        """
+        Recarga el valor si sus archivos cambiaron. Devuelve True si hubo reemplazo.
+
+        Si los archivos cambian durante la carga se descarta el resultado y se
+        reintenta en la siguiente revisión. Un valor que no pasa la validación
+        no reemplaza al activo y no se vuelve a intentar hasta el próximo cambio.
+        """
+        with self._load_lock:
+            if self.value is None:
+                return False
+            signature = file_signature(self.paths)
+            if signature == self.signature:
+                return False
+            try:
+                candidate = self.load()
+                if file_signature(self.paths) != signature:
+                    return False
+                if self.validate is not None:
+                    self.validate(candidate, self.value)
+            except Exception as e:
+                self.signature = signature
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.warning("No se pudo recargar %s: %s", self.name, self.last_error)
+                return False
+
+            self.last_error = None
+            if self.version_of(candidate) == self.version:
+                self.signature = signature
+                return False
+            self._swap(candidate, signature)
+            self.reloads += 1
+            logger.info("%s actualizado a la versión %s", self.name, self.version)
+            return True
+
+    def start(self):
+        """Inicia el hilo que revisa los archivos cada `interval` segundos."""
+        if self.interval <= 0 or self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name=f"reload-{self.name}", daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Error al revisar %s", self.name)
+
+    def stop(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "watching": self.paths,
+            "interval": self.interval if self._watcher is not None else 0,
+        }
@@ -0,0 +1,133 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import model
+from bulk import DEFAULT_CHUNKSIZE, detect_format, iter_chunks, predictions_frame
+from serving import START_METHOD
+
+# Puntaje por lotes del inventario completo sin pasar por la API. Cada bloque de
+# la entrada se predice en un proceso del pool y se escribe como un archivo
+# `part-NNNNN` en el directorio de salida; al repetir la ejecución se saltan los
+# bloques ya escritos.
+
+MANIFEST_NAME = "_manifest.json"
+OUTPUT_EXTENSIONS = {"parquet": ".parquet", "csv": ".csv"}
+
+
+def part_path(output_dir, index, output_format):
+    return os.path.join(output_dir, f"part-{index:05d}{OUTPUT_EXTENSIONS[output_format]}")
+
+
+def _init_worker(nthread):
+    model.set_nthread(nthread)
+    # Cada bomba del inventario se predice una sola vez: el caché solo gastaría memoria
+    model.prediction_cache.max_entries = 0
+
+
+def score_chunk(chunk, path, output_format):
+    """
+    Predice un bloque y lo escribe en `path` (primero en un temporal, de modo
+    que un archivo de bloque existente siempre está completo).
+    """
+    result_df = predictions_frame(model.predict_pump_status(chunk, columnar=True))
+    tmp_path = f"{path}.tmp"
+    if output_format == "parquet":
+        result_df.to_parquet(tmp_path, index=False)
+    else:
+        result_df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return len(result_df)
+
+
+def check_manifest(output_dir, manifest, overwrite):
+    """
+    Guarda el manifiesto de la ejecución. Para reanudar, la entrada, el tamaño
+    de bloque, el formato y la versión del modelo deben coincidir con los de la
+    ejecución anterior; con `overwrite` se descartan los bloques previos.
+    """
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if os.path.exists(path) and not overwrite:
+        with open(path, encoding="utf-8") as f:
+            previous = json.load(f)
+        if previous != manifest:
+            changed = sorted(key for key in manifest if previous.get(key) != manifest[key])
+            raise SystemExit(f"{output_dir} tiene resultados de otra ejecución (cambió {changed}); use --overwrite")
+    elif overwrite:
+        for name in os.listdir(output_dir):
+            if name.startswith("part-"):
+                os.remove(os.path.join(output_dir, name))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def run(args):
+    os.makedirs(args.output_dir, exist_ok=True)
+    input_format = detect_format(args.input)
+    stat = os.stat(args.input)
+    # Se carga antes de crear los procesos para que con `fork` lo hereden ya cargado
+    loaded = model.get_model()
+    check_manifest(args.output_dir, {
+        "input": os.path.abspath(args.input),
+        "input_size": stat.st_size,
+        "input_mtime_ns": stat.st_mtime_ns,
+        "chunksize": args.chunksize,
+        "format": args.format,
+        "model_version": loaded.version,
+    }, args.overwrite)
+
+    required = ["id"] + model.FEATURE_FIELDS
+    context = multiprocessing.get_context(START_METHOD)
+    started = time.perf_counter()
+    scored_rows = skipped_chunks = 0
+    pending = {}
+
+    def collect(done):
+        nonlocal scored_rows
+        for future in done:
+            index = pending.pop(future)
+            scored_rows += future.result()
+            if args.verbose:
+                print(f"bloque {index} listo", file=sys.stderr)
+
+    with ProcessPoolExecutor(
+        max_workers=args.workers, mp_context=context, initializer=_init_worker, initargs=(args.nthread,)
+    ) as pool:
+        for index, chunk in enumerate(iter_chunks(args.input, input_format, args.chunksize)):
+            if index == 0:
+                missing = [column for column in required if column not in chunk.columns]
+                if missing:
+                    raise SystemExit(f"Faltan columnas en {args.input}: {missing}")
+            path = part_path(args.output_dir, index, args.format)
+            if os.path.exists(path):
+                skipped_chunks += 1
+                continue
+            # Se limita el número de bloques en vuelo para acotar la memoria
+            if len(pending) >= 2 * args.workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[pool.submit(score_chunk, chunk, path, args.format)] = index
+        collect(wait(pending).done)
+
+    elapsed = time.perf_counter() - started
+    rate = scored_rows / elapsed if elapsed > 0 else 0.0
+    print(f"{scored_rows} filas predichas en {elapsed:.1f} s ({rate:,.0f} filas/s, {args.workers} procesos); "
+          f"{skipped_chunks} bloques ya escritos se saltaron")
+    return scored_rows, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Predice el estado de todas las bombas de un archivo CSV o Parquet.")
+    parser.add_argument("input", help="archivo de entrada (.csv o .parquet) con las columnas de PumpRecord")
+    parser.add_argument("output_dir", help="directorio donde se escriben los bloques de resultados")
+    parser.add_argument("--format", choices=sorted(OUTPUT_EXTENSIONS), default="parquet", help="formato de salida")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="filas por bloque")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="procesos de predicción")
+    parser.add_argument("--nthread", type=int, default=1, help="hilos de XGBoost por proceso")
+    parser.add_argument("--overwrite", action="store_true", help="descartar resultados previos en output_dir")
+    parser.add_argument("--verbose", action="store_true", help="informar cada bloque terminado")
+    run(parser.parse_args())
@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import model
+from bulk import DEFAULT_CHUNKSIZE, detect_format, iter_chunks
+from model import STATUS_GROUPS
+
+# Puntaje incremental del inventario. Cada ejecución guarda una foto (Parquet)
+# con el hash de los campos de cada bomba, su estado predicho y sus
+# probabilidades. La siguiente ejecución compara el inventario nuevo con la foto
+# por `id`: solo se predicen las bombas nuevas o con campos distintos y las
+# demás conservan la predicción anterior. Si cambió la versión del modelo se
+# predice todo de nuevo.
+
+SNAPSHOT_METADATA_KEY = b"pump_snapshot"
+
+
+def snapshot_schema(metadata):
+    import pyarrow as pa
+
+    fields = [
+        pa.field("pump_id", pa.string()),
+        pa.field("feature_hash", pa.uint64()),
+        pa.field("status_group", pa.dictionary(pa.int8(), pa.string())),
+    ] + [pa.field(status, pa.float32()) for status in STATUS_GROUPS]
+    return pa.schema(fields, metadata={SNAPSHOT_METADATA_KEY: json.dumps(metadata).encode()})
+
+
+def read_snapshot(path):
+    """
+    Lee la foto de la ejecución anterior. Devuelve (DataFrame indexado por
+    `pump_id`, metadatos), o (None, {}) si no existe.
+    """
+    if not os.path.exists(path):
+        return None, {}
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path)
+    info = json.loads((table.schema.metadata or {}).get(SNAPSHOT_METADATA_KEY, b"{}"))
+    snapshot = table.to_pandas().set_index("pump_id")
+    return snapshot, info
+
+
+def snapshot_table(pump_ids, hashes, probabilities, schema):
+    import pyarrow as pa
+
+    codes = probabilities.argmax(axis=1).astype(np.int8)
+    columns = [
+        pa.array(pump_ids, type=pa.string()),
+        pa.array(hashes, type=pa.uint64()),
+        pa.DictionaryArray.from_arrays(codes, pa.array(STATUS_GROUPS)),
+    ] + [pa.array(probabilities[:, i], type=pa.float32()) for i in range(len(STATUS_GROUPS))]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def run(args):
+    import pyarrow.parquet as pq
+
+    loaded = model.get_model()
+    model.set_nthread(args.nthread)
+    # Cada bomba se predice una sola vez: el caché solo gastaría memoria
+    model.prediction_cache.max_entries = 0
+
+    snapshot, info = read_snapshot(args.snapshot)
+    full = args.full or snapshot is None or info.get("model_version") != loaded.version
+    if snapshot is None:
+        snapshot = snapshot_table([], np.empty(0, dtype=np.uint64), np.empty((0, len(STATUS_GROUPS))),
+                                  snapshot_schema({})).to_pandas().set_index("pump_id")
+    if not snapshot.index.is_unique:
+        raise SystemExit(f"La foto {args.snapshot} tiene ids repetidos")
+    previous_ids = snapshot.index
+    previous_hashes = snapshot["feature_hash"].to_numpy(dtype=np.uint64)
+    previous_codes = pd.Categorical(snapshot["status_group"], categories=STATUS_GROUPS).codes
+    previous_probabilities = snapshot[STATUS_GROUPS].to_numpy(dtype=np.float32)
+
+    schema = snapshot_schema({
+        "model_version": loaded.version,
+        "input": os.path.abspath(args.input),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    })
+    report = dict.fromkeys(["rows", "added", "changed", "unchanged", "removed", "scored", "flipped"], 0)
+    report["full"] = full
+    seen = np.zeros(len(previous_ids), dtype=bool)
+    seen_ids = set()
+    required = ["id"] + model.FEATURE_FIELDS
+    started = time.perf_counter()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.snapshot)), exist_ok=True)
+    tmp_path = f"{args.snapshot}.tmp"
+    writer = pq.ParquetWriter(tmp_path, schema)
+    try:
+        for index, chunk in enumerate(iter_chunks(args.input, detect_format(args.input), args.chunksize)):
+            if index == 0:
+                missing = [column for column in required if column not in chunk.columns]
+                if missing:
+                    raise SystemExit(f"Faltan columnas en {args.input}: {missing}")
+            pump_ids = chunk["id"].astype(str).to_numpy(dtype=object)
+            if len(set(pump_ids)) < len(pump_ids) or seen_ids.intersection(pump_ids):
+                raise SystemExit(f"{args.input} tiene ids repetidos")
+            seen_ids.update(pump_ids)
+
+            hashes = model.feature_hashes(chunk)
+            positions = previous_ids.get_indexer(pump_ids)
+            known = positions >= 0
+            seen[positions[known]] = True
+            changed = known.copy()
+            changed[known] = previous_hashes[positions[known]] != hashes[known]
+
+            report["rows"] += len(chunk)
+            report["added"] += int((~known).sum())
+            report["changed"] += int(changed.sum())
+            report["unchanged"] += int((known & ~changed).sum())
+
+            # Se conservan las predicciones anteriores y se predicen las que faltan
+            to_score = np.ones(len(chunk), dtype=bool) if full else ~known | changed
+            probabilities = np.empty((len(chunk), len(STATUS_GROUPS)), dtype=np.float32)
+            carried = ~to_score
+            probabilities[carried] = previous_probabilities[positions[carried]]
+            if to_score.any():
+                probabilities[to_score] = model.predict_probabilities(chunk[to_score])
+            report["scored"] += int(to_score.sum())
+
+            # Bombas que ya estaban en la foto y cambiaron de estado predicho
+            codes = probabilities.argmax(axis=1)
+            report["flipped"] += int((codes[known] != previous_codes[positions[known]]).sum())
+
+            writer.write_table(snapshot_table(pump_ids, hashes, probabilities, schema))
+            if args.verbose:
+                print(f"bloque {index}: {to_score.sum()} de {len(chunk)} filas predichas", file=sys.stderr)
+    except BaseException:
+        writer.close()
+        os.remove(tmp_path)
+        raise
+    writer.close()
+    # La foto anterior solo se reemplaza cuando la nueva está completa
+    os.replace(tmp_path, args.snapshot)
+
+    report["removed"] = int((~seen).sum())
+    report["model_version"] = loaded.version
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    print(f"{report['rows']} bombas: {report['added']} nuevas, {report['changed']} modificadas, "
+          f"{report['removed']} eliminadas, {report['flipped']} cambiaron de estado; "
+          f"{report['scored']} predichas en {report['seconds']:.1f} s"
+          + (" (predicción completa)" if full else ""))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Predice solo las bombas nuevas o modificadas respecto de la foto de la ejecución anterior."
+    )
+    parser.add_argument("input", help="inventario (.csv o .parquet) con las columnas de PumpRecord")
+    parser.add_argument("snapshot", help="foto en Parquet: se lee si existe y se reemplaza al terminar")
+    parser.add_argument("--full", action="store_true", help="predecir todas las bombas aunque no hayan cambiado")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="filas por bloque")
+    parser.add_argument("--nthread", type=int, default=os.cpu_count() or 1, help="hilos de XGBoost")
+    parser.add_argument("--report", help="archivo JSON donde guardar los conteos")
+    parser.add_argument("--verbose", action="store_true", help="informar cada bloque terminado")
+    run(parser.parse_args())
@@ -0,0 +1,142 @@
+import json
+
+import pandas as pd
+
+from model import STATUS_GROUPS, build_predictions
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+# Otros nombres con los que los clientes suelen pedir o enviar msgpack
+MEDIA_TYPE_ALIASES = {
+    "application/x-msgpack": MSGPACK_MEDIA_TYPE,
+    "application/vnd.msgpack": MSGPACK_MEDIA_TYPE,
+}
+
+
+def dumps(obj):
+    """JSON compacto en bytes; usa orjson si está instalado."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def media_type_of(content_type):
+    """Tipo de medio normalizado de un encabezado Content-Type (sin parámetros)."""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return MEDIA_TYPE_ALIASES.get(media_type, media_type)
+
+
+def negotiate(accept):
+    """
+    Elige el formato de respuesta a partir del encabezado Accept, respetando
+    los pesos `q`. Sin encabezado, o con `*/*`, se responde JSON. Devuelve None
+    si ninguno de los formatos pedidos está soportado.
+    """
+    if not accept:
+        return JSON_MEDIA_TYPE
+    candidates = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        weight = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    weight = float(param[2:])
+                except ValueError:
+                    weight = 0.0
+        candidates.append((-weight, position, media_type_of(media_type)))
+
+    for negative_weight, _, media_type in sorted(candidates):
+        if negative_weight >= 0:
+            break
+        if media_type in ENCODERS:
+            return media_type
+        if media_type in ("*/*", "application/*"):
+            return JSON_MEDIA_TYPE
+    return None
+
+
+def prediction_columns(ids, probabilities):
+    """
+    Predicciones como columnas: `pump_id`, `status_group` (categórica) y una
+    columna de probabilidad por estado, el mismo esquema que la salida CSV de
+    `/predict/bulk`.
+    """
+    columns = {
+        "pump_id": pd.Series(ids).astype(str).tolist(),
+        "status_group": pd.Categorical.from_codes(probabilities.argmax(axis=1), STATUS_GROUPS),
+    }
+    for i, status in enumerate(STATUS_GROUPS):
+        columns[status] = probabilities[:, i].astype(float)
+    return columns
+
+
+def encode_json(ids, probabilities, columnar=False):
+    return dumps(build_predictions(ids, probabilities, columnar=columnar))
+
+
+def encode_msgpack(ids, probabilities, columnar=False):
+    import msgpack
+
+    columns = prediction_columns(ids, probabilities)
+    return msgpack.packb({
+        name: values if isinstance(values, list) else values.tolist() for name, values in columns.items()
+    })
+
+
+def encode_arrow(ids, probabilities, columnar=False):
+    import pyarrow as pa
+
+    columns = prediction_columns(ids, probabilities)
+    status_codes = columns["status_group"].codes.astype("int8")
+    table = pa.table({
+        "pump_id": pa.array(columns["pump_id"], type=pa.string()),
+        "status_group": pa.DictionaryArray.from_arrays(status_codes, pa.array(STATUS_GROUPS)),
+        **{status: pa.array(columns[status], type=pa.float64()) for status in STATUS_GROUPS},
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+# Codificadores de respuesta por tipo de medio. `columnar` solo cambia la forma
+# del JSON; msgpack y Arrow siempre llevan columnas tipadas.
+ENCODERS = {
+    JSON_MEDIA_TYPE: encode_json,
+    MSGPACK_MEDIA_TYPE: encode_msgpack,
+    ARROW_MEDIA_TYPE: encode_arrow,
+}
+
+
+def decode_msgpack(body, records=False):
+    """Cuerpo msgpack con la misma estructura que el JSON del endpoint."""
+    import msgpack
+
+    return msgpack.unpackb(body)
+
+
+def decode_arrow(body, records=False):
+    """
+    Cuerpo Arrow IPC (stream) con una columna por campo. Con `records=True` se
+    convierte en `{"data": [registro, ...]}`, la forma que espera `/predict`.
+    """
+    import pyarrow as pa
+
+    table = pa.ipc.open_stream(body).read_all()
+    if records:
+        return {"data": table.to_pylist()}
+    return table.to_pydict()
+
+
+# Decodificadores de cuerpos de solicitud que no son JSON
+DECODERS = {
+    MSGPACK_MEDIA_TYPE: decode_msgpack,
+    ARROW_MEDIA_TYPE: decode_arrow,
+}
@@ -0,0 +1,151 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+import model
+
+# Configuración por variables de entorno. Con PUMP_WORKERS=0 (por defecto) se
+# predice en el proceso de la API, como antes.
+WORKERS = int(os.environ.get("PUMP_WORKERS", "0"))
+# Procesos reservados para lotes pequeños, que nunca esperan detrás de uno grande
+SMALL_WORKERS = int(os.environ.get("PUMP_SMALL_WORKERS", "1"))
+# Lotes con hasta estas filas van al pool reservado (del orden de un lote agrupado);
+# los medianos van al pool de lotes grandes sin dividirse
+SMALL_ROWS = int(os.environ.get("PUMP_SMALL_ROWS", "64"))
+# Hilos de XGBoost por proceso
+NTHREAD = int(os.environ.get("PUMP_NTHREAD", "1"))
+# Lotes con más filas que esto se consideran grandes y se reparten entre procesos
+SPLIT_ROWS = int(os.environ.get("PUMP_SPLIT_ROWS", "5000"))
+START_METHOD = os.environ.get("PUMP_START_METHOD", "fork" if os.name == "posix" else "spawn")
+# Los pools que se recrean tras una recarga nacen de un proceso con hilos (recarga,
+# threadpool, batcher): con `fork` un hijo podría heredar un lock tomado y
+# bloquearse, así que se usa un método que arranca procesos limpios
+RESTART_METHOD = os.environ.get(
+    "PUMP_RESTART_METHOD",
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn",
+)
+
+_small_pool = None
+_large_pool = None
+_pool_config = None
+
+
+def _init_worker(nthread):
+    """
+    Inicializa un proceso: el modelo se carga una sola vez (o se hereda del
+    proceso padre con `fork`) y se fija el número de hilos.
+    """
+    model.set_nthread(nthread)
+
+
+def _create_pools(workers, small_workers, nthread, start_method=START_METHOD):
+    # Se carga antes de crear los procesos para que con `fork` lo hereden ya cargado
+    model.get_model()
+    context = multiprocessing.get_context(start_method)
+    small_pool = ProcessPoolExecutor(
+        max_workers=max(small_workers, 1), mp_context=context, initializer=_init_worker, initargs=(nthread,)
+    )
+    large_pool = ProcessPoolExecutor(
+        max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(nthread,)
+    )
+    return small_pool, large_pool
+
+
+def _start_workers(pool, n_workers):
+    """
+    Arranca ya los `n_workers` procesos del pool (`ProcessPoolExecutor` los crea
+    a medida que llegan tareas) y devuelve las tareas de arranque.
+    """
+    return [pool.submit(os.getpid) for _ in range(n_workers)]
+
+
+def start(workers=WORKERS, small_workers=SMALL_WORKERS, nthread=NTHREAD):
+    """
+    Crea los pools de procesos y arranca sus procesos. No hace nada si
+    `workers` es 0. Debe llamarse antes de iniciar los hilos de recarga.
+    """
+    global _small_pool, _large_pool, _pool_config
+    if workers <= 0 or _large_pool is not None:
+        return
+    _pool_config = (workers, small_workers, nthread)
+    _small_pool, _large_pool = _create_pools(*_pool_config)
+    # Con `fork` los procesos deben crearse antes de que el proceso tenga otros hilos
+    for future in _start_workers(_small_pool, max(small_workers, 1)) + _start_workers(_large_pool, workers):
+        future.result()
+
+
+def restart():
+    """
+    Reemplaza los pools por otros con el modelo activo (tras una recarga en
+    caliente). Los procesos nuevos se crean con `RESTART_METHOD` y cargan el
+    modelo por su cuenta. Las predicciones en curso terminan en los procesos
+    anteriores, que se cierran al quedar libres.
+    """
+    global _small_pool, _large_pool
+    if _large_pool is None:
+        return
+    old_pools = (_small_pool, _large_pool)
+    _small_pool, _large_pool = _create_pools(*_pool_config, start_method=RESTART_METHOD)
+    # Los procesos nuevos cargan el modelo mientras el event loop sigue atendiendo
+    small_workers, workers = max(_pool_config[1], 1), _pool_config[0]
+    _start_workers(_small_pool, small_workers)
+    _start_workers(_large_pool, workers)
+    for pool in old_pools:
+        pool.shutdown(wait=False)
+
+
+def shutdown():
+    global _small_pool, _large_pool
+    for pool in (_small_pool, _large_pool):
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+    _small_pool = _large_pool = None
+
+
+def enabled():
+    return _large_pool is not None
+
+
+async def predict_probabilities(input_df):
+    """
+    Calcula las probabilidades sin bloquear el event loop.
+
+    Sin pools se usa el threadpool de Starlette. Con pools, los lotes de hasta
+    `SMALL_ROWS` filas van al pool reservado, los medianos a un proceso del
+    pool de lotes grandes, y los de más de `SPLIT_ROWS` filas se dividen en
+    bloques que se reparten entre esos procesos y se vuelven a unir en orden.
+    """
+    return await _dispatch(model.predict_probabilities, input_df)
+
+
+async def explain_contributions(input_df, approximate=False):
+    """
+    Contribuciones por campo (`model.explain_contributions`), repartidas entre
+    los procesos igual que las predicciones. Cada proceso tiene su propio caché
+    de explicaciones.
+    """
+    return await _dispatch(partial(model.explain_contributions, approximate=approximate), input_df)
+
+
+async def _dispatch(func, input_df):
+    if not enabled():
+        return await run_in_threadpool(func, input_df)
+
+    loop = asyncio.get_running_loop()
+    if len(input_df) <= SMALL_ROWS:
+        return await loop.run_in_executor(_small_pool, func, input_df)
+    if len(input_df) <= SPLIT_ROWS:
+        return await loop.run_in_executor(_large_pool, func, input_df)
+
+    n_parts = -(-len(input_df) // SPLIT_ROWS)
+    bounds = np.linspace(0, len(input_df), n_parts + 1, dtype=int)
+    parts = await asyncio.gather(*(
+        loop.run_in_executor(_large_pool, func, input_df.iloc[start:stop])
+        for start, stop in zip(bounds[:-1], bounds[1:])
+    ))
+    return np.concatenate(parts)
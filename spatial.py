@@ -0,0 +1,143 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Índice espacial de las bombas. Las coordenadas se proyectan a la esfera
+# unitaria en 3D, donde la distancia euclidiana (cuerda) crece con la distancia
+# sobre la superficie: un KD-tree sobre esos puntos responde consultas de radio
+# y de vecinos más cercanos en distancia de haversine exacta. Los rectángulos
+# (viewport del mapa) se resuelven con las longitudes ordenadas.
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_unit_vectors(longitude, latitude):
+    """Puntos (n, 3) sobre la esfera unitaria para longitudes y latitudes en grados."""
+    lon = np.radians(np.asarray(longitude, dtype=np.float64))
+    lat = np.radians(np.asarray(latitude, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def haversine_km(lon1, lat1, lon2, lat2):
+    """Distancia sobre la superficie terrestre en km (admite arreglos)."""
+    lon1, lat1, lon2, lat2 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0.0, 1.0))
+
+
+def km_to_chord(distance_km):
+    return 2 * np.sin(min(distance_km / EARTH_RADIUS_KM, np.pi) / 2)
+
+
+def validate_point(longitude, latitude):
+    if not (-180.0 <= longitude <= 180.0 and -90.0 <= latitude <= 90.0):
+        raise ValueError(f"Coordenadas fuera de rango: ({longitude}, {latitude})")
+
+
+class SpatialIndex:
+    """
+    Índice de posiciones de filas por ubicación.
+
+    Se construye una sola vez: un KD-tree sobre los puntos en la esfera unitaria
+    y las longitudes ordenadas. Las filas sin coordenadas quedan fuera del
+    índice. Todas las consultas devuelven posiciones de filas del DataFrame
+    original.
+    """
+
+    def __init__(self, longitude, latitude):
+        self.longitude = np.asarray(longitude, dtype=np.float64)
+        self.latitude = np.asarray(latitude, dtype=np.float64)
+        self.n_rows = len(self.longitude)
+
+        valid = np.isfinite(self.longitude) & np.isfinite(self.latitude)
+        self.rows = np.flatnonzero(valid)
+        self.tree = cKDTree(to_unit_vectors(self.longitude[valid], self.latitude[valid]))
+
+        order = np.argsort(self.longitude[self.rows], kind='stable')
+        self.lon_order = self.rows[order]
+        self.sorted_lon = self.longitude[self.lon_order]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def radius(self, longitude, latitude, radius_km, limit=None):
+        """
+        Filas a `radius_km` o menos del punto, de la más cercana a la más
+        lejana. Devuelve (filas, distancias en km), con a lo sumo `limit` filas.
+        """
+        validate_point(longitude, latitude)
+        center = to_unit_vectors([longitude], [latitude])[0]
+        found = np.asarray(self.tree.query_ball_point(center, km_to_chord(radius_km), return_sorted=False),
+                           dtype=np.intp)
+        rows = self.rows[found]
+        distances = haversine_km(longitude, latitude, self.longitude[rows], self.latitude[rows])
+        if limit is not None and limit < len(rows):
+            nearest = np.argpartition(distances, limit)[:limit]
+            rows, distances = rows[nearest], distances[nearest]
+        order = np.argsort(distances, kind='stable')
+        return rows[order], distances[order]
+
+    def nearest(self, longitude, latitude, k=10):
+        """Las `k` filas más cercanas al punto: (filas, distancias en km), ordenadas."""
+        validate_point(longitude, latitude)
+        k = min(k, len(self.rows))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        center = to_unit_vectors([longitude], [latitude])[0]
+        chords, found = self.tree.query(center, k=k)
+        return self.rows[np.atleast_1d(found)], chord_to_km(np.atleast_1d(chords))
+
+    def bbox(self, lon_min, lat_min, lon_max, lat_max):
+        """
+        Filas dentro del rectángulo (bordes incluidos), en orden de longitud.
+        Si `lon_min > lon_max` el rectángulo cruza el antimeridiano.
+        """
+        if lon_min <= lon_max:
+            ranges = [(lon_min, lon_max)]
+        else:
+            ranges = [(lon_min, 180.0), (-180.0, lon_max)]
+        parts = []
+        for low, high in ranges:
+            start = np.searchsorted(self.sorted_lon, low, side='left')
+            stop = np.searchsorted(self.sorted_lon, high, side='right')
+            rows = self.lon_order[start:stop]
+            latitude = self.latitude[rows]
+            parts.append(rows[(latitude >= lat_min) & (latitude <= lat_max)])
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+
+class PumpLocations:
+    """
+    Inventario de bombas con su índice espacial, tal como lo consulta la API.
+    Se construye y se reemplaza junto con los datos.
+    """
+
+    def __init__(self, df, version):
+        self.df = df
+        self.version = version
+        self.index = SpatialIndex(df['longitude'], df['latitude'])
+        self.ids = df['id'].astype(str).to_numpy() if 'id' in df.columns else df.index.astype(str).to_numpy()
+
+    def records(self, rows, distances=None):
+        """Bombas de las filas `rows` como diccionarios (id, coordenadas, estado observado y distancia)."""
+        result = {
+            'pump_id': self.ids[rows].tolist(),
+            'longitude': self.index.longitude[rows].tolist(),
+            'latitude': self.index.latitude[rows].tolist(),
+        }
+        if 'status_group' in self.df.columns:
+            status = self.df['status_group'].iloc[rows].astype(object)
+            result['status_group'] = status.where(status.notna(), None).tolist()
+        if distances is not None:
+            result['distance_km'] = np.round(distances, 4).tolist()
+        return [dict(zip(result, values)) for values in zip(*result.values())]
+
+    def features(self, rows):
+        """Filas `rows` como entrada del modelo (campos de `PumpRecord`)."""
+        frame = self.df.iloc[rows].reset_index(drop=True)
+        frame['id'] = self.ids[rows]
+        return frame